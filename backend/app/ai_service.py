@@ -1,24 +1,372 @@
 import os
 import base64
-from typing import List, Tuple, Dict
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Tuple, Dict, Optional
 from pathlib import Path
+import httpx
 import anthropic
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+from app.image_cache import ImagePayloadCache
+from app.metrics import metrics
+from app.stage_timer import StageTimer
+from app.transcript import Transcript
+
+
+# Status codes worth retrying: rate limited, transient server errors, overloaded
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+# Shared per-process client so every job reuses one connection pool
+_shared_client: Optional[AsyncAnthropic] = None
+_request_semaphore: Optional[asyncio.Semaphore] = None
+_image_pool: Optional[ThreadPoolExecutor] = None
+# Whether the SDK's local tokenizer can be loaded (None = not tried yet)
+_tokenizer_available: Optional[bool] = None
+
+
+# Static instructions, sent as the system prompt so the prefix is identical
+# on every request and can be served from the prompt cache
+SELECTION_INSTRUCTIONS = """You are analyzing frames from a video to select the most important moments for a newsletter article.
+
+You will be given frames extracted from the video. Please analyze these frames and identify the 5-8 most visually interesting and relevant frames that would work well as screenshots in a newsletter article.
+
+IMPORTANT RESTRICTION: **DO NOT select any frames that contain people, faces, or human figures.** Only select frames that show:
+- Slides/presentations (without people)
+- Diagrams and charts
+- Text and graphics
+- Objects and products
+- Landscapes and scenery
+- Computer screens showing content
+- Any visual content WITHOUT people
+
+If a frame contains any person (even partially visible), skip it and choose a different frame.
+
+For each selected frame, provide:
+1. The frame number, as given in the frame's label
+2. A brief description of what makes it important
+3. A caption in English
+4. Confirmation that it contains no people
+
+Respond in JSON format:
+{
+  "selected_frames": [
+    {
+      "frame_index": 0,
+      "reason": "Shows the main topic introduction slide with no people",
+      "caption": "Introduction to the topic",
+      "contains_people": false
+    }
+  ]
+}"""
+
+MAP_INSTRUCTIONS = """You are preparing notes for a newsletter writer from a part of an English video transcript.
+
+Write detailed notes in English on everything important in this part: main points, arguments, facts, figures, names, examples and notable quotes, in the order they appear. Do not add anything that is not in the transcript. Respond with the notes only."""
+
+ARTICLE_INSTRUCTIONS = """You are a professional newsletter writer. Create a comprehensive newsletter article in Slovenian language based on the English video content you are given.
+
+Instructions:
+1. Write the article entirely in Slovenian language
+2. The article should be well-structured with a title, introduction, main content sections, and conclusion
+3. The article should be approximately 800-1200 words
+4. Create natural transitions between sections
+5. The tone should be informative and engaging
+6. Include relevant context and explanations
+7. Make it suitable for a newsletter format
+
+Important: Write ONLY the article content in Slovenian. Do not include any English text, explanations, or meta-commentary."""
+
+PROOFREAD_INSTRUCTIONS = """Ti si strokovni učitelj slovenskega jezika in lektor. Tvoja naloga je pregledati in popraviti en odstavek članka v slovenščini.
+
+NAVODILA:
+1. Preglej odstavek za slovnične napake
+2. Popravi morebitne napake v sklanjanju, spreganju, ločilih
+3. Izboljšaj slog in naravnost slovenskega jezika
+4. Poskrbi, da se besedilo bere tekoče in naravno
+5. Ohrani pomen originalnega besedila
+6. Popravi morebitne anglizme v bolj naravno slovenščino
+7. Preveri pravilno uporabo slovenskih znakov (č, š, ž)
+
+POMEMBNO: 
+- Dobiš samo en odstavek (ali seznam) iz daljšega članka, ne celotnega članka
+- Vrni SAMO popravljen odstavek v slovenščini
+- Ohrani oblikovanje Markdown (krepko, ležeče, povezave, alineje seznama)
+- Ne dodajaj naslovov, novih odstavkov, uvoda ali zaključka
+- Ne dodajaj komentarjev, opomb ali razlag
+- Ne dodajaj novih vsebin, samo popravi obstoječe"""
+
+
+def get_shared_client(api_key: str) -> AsyncAnthropic:
+    """Return the process-wide async Anthropic client, creating it on first use"""
+    global _shared_client
+    if _shared_client is None:
+        max_connections = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", 20))
+        timeout = httpx.Timeout(
+            float(os.getenv("ANTHROPIC_TIMEOUT", 180)),
+            connect=10.0
+        )
+        _shared_client = AsyncAnthropic(
+            api_key=api_key,
+            timeout=timeout,
+            # Retries are handled in AIService._create_message
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                ),
+                follow_redirects=True,
+            ),
+        )
+    return _shared_client
+
+
+def _get_request_semaphore() -> asyncio.Semaphore:
+    """Per-process cap on in-flight Claude requests"""
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", 8)))
+    return _request_semaphore
+
+
+def _get_image_pool() -> ThreadPoolExecutor:
+    """Bounded pool for image preparation (PIL releases the GIL while decoding)"""
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("IMAGE_PREP_WORKERS", 4)),
+            thread_name_prefix="image-prep"
+        )
+    return _image_pool
+
+
+def article_settings() -> Dict:
+    """Article generation settings from the environment
+    
+    Also used as part of the artifact cache key for articles.
+    """
+    return {
+        "long_input_tokens": int(os.getenv("ARTICLE_LONG_INPUT_TOKENS", 16000)),
+        "chunk_tokens": int(os.getenv("ARTICLE_CHUNK_TOKENS", 6000)),
+        "summary_max_tokens": int(os.getenv("ARTICLE_SUMMARY_MAX_TOKENS", 1000)),
+    }
 
 
 class AIService:
     """Handles AI operations using Claude API"""
     
-    def __init__(self):
+    model = "claude-haiku-4-5-20251001"
+    
+    # Vision input limits: keep under the 2000 pixel limit
+    IMAGE_MAX_DIMENSION = 1900
+    IMAGE_QUALITY = 85
+    
+    # Transcript context attached to each frame sent for selection
+    FRAME_CONTEXT_SECONDS = 30
+    FRAME_CONTEXT_CHARS = 400
+    # Excerpt used instead when the transcript has no timestamps
+    TRANSCRIPT_EXCERPT_CHARS = 2000
+    
+    def __init__(self, timer: Optional[StageTimer] = None):
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
         
-        self.client = Anthropic(api_key=api_key)
-        self.model = "claude-haiku-4-5-20251001"
+        self.client = get_shared_client(api_key)
+        self.max_retries = int(os.getenv("ANTHROPIC_MAX_RETRIES", 4))
+        self.max_vision_frames = int(os.getenv("MAX_VISION_FRAMES", 20))
+        self.image_cache = ImagePayloadCache()
+        self.retry_count = 0
+        
+        # Long transcripts are summarised in chunks before writing the article
+        settings = article_settings()
+        self.long_input_tokens = settings["long_input_tokens"]
+        self.chunk_tokens = settings["chunk_tokens"]
+        self.summary_max_tokens = settings["summary_max_tokens"]
+        self.map_concurrency = int(os.getenv("ARTICLE_MAP_CONCURRENCY", 4))
+        
+        # Mark the static system prompts as cacheable. Prefixes shorter than
+        # the model's minimum (1024 tokens for Sonnet/Opus, 4096 for Haiku
+        # 4.5) are processed normally and simply not cached.
+        self.prompt_cache = os.getenv("PROMPT_CACHE", "true").lower() == "true"
+        
+        # Token usage and latency per phase (selection, map, article, proofread)
+        self.usage: Dict[str, Dict[str, float]] = {}
+        # Job timeline each call is recorded on, if any
+        self.timer = timer
     
-    def _encode_image(self, image_path: Path) -> str:
-        """Encode image to base64, resizing if necessary"""
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, anthropic.APIConnectionError):
+            # Includes APITimeoutError
+            return True
+        if isinstance(error, anthropic.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+    
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Exponential backoff with jitter, honouring Retry-After when present"""
+        if isinstance(error, anthropic.APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                if retry_after is not None:
+                    return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        return min(2 ** attempt, 30) + random.uniform(0, 1)
+    
+    def _record_call(
+        self,
+        phase: str,
+        start: float,
+        response=None,
+        first_token_seconds: Optional[float] = None,
+        retries: int = 0,
+        image_tokens: int = 0,
+        error: Optional[Exception] = None
+    ):
+        """Add a finished (or finally failed) call to the usage totals,
+        the job timeline and the process metrics
+        
+        Args:
+            phase: Pipeline phase the call belongs to
+            start: time.perf_counter() before the first attempt
+            response: Final message, None if the call failed
+            first_token_seconds: Time to the first streamed delta
+            retries: Attempts that were retried
+            image_tokens: Estimated tokens of the images sent
+            error: The exception the call finally failed with
+        """
+        seconds = time.perf_counter() - start
+        call = {"seconds": seconds, "retries": retries}
+        if first_token_seconds is not None:
+            call["first_token_seconds"] = first_token_seconds
+            metrics.llm_first_token_seconds.observe(first_token_seconds, phase=phase)
+        metrics.llm_seconds.observe(seconds, phase=phase)
+        
+        if response is not None:
+            stats = self.usage.setdefault(phase, {
+                "calls": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cache_read_input_tokens": 0,
+                "cache_creation_input_tokens": 0,
+                "image_tokens": 0,
+                "retries": 0,
+                "seconds": 0.0,
+            })
+            tokens = {
+                "input_tokens": response.usage.input_tokens,
+                "output_tokens": response.usage.output_tokens,
+                # Not declared by this SDK version's Usage model, but kept as extra fields
+                "cache_read_input_tokens": getattr(response.usage, "cache_read_input_tokens", None) or 0,
+                "cache_creation_input_tokens": getattr(response.usage, "cache_creation_input_tokens", None) or 0,
+                "image_tokens": image_tokens,
+            }
+            stats["calls"] += 1
+            for field, count in tokens.items():
+                stats[field] += count
+                if count:
+                    metrics.llm_tokens.inc(count, phase=phase, type=field[:-len("_tokens")])
+            stats["retries"] += retries
+            stats["seconds"] = round(stats["seconds"] + seconds, 3)
+            if first_token_seconds is not None:
+                # Time to first token of the phase's first streamed call
+                stats.setdefault("first_token_seconds", round(first_token_seconds, 3))
+            call.update(tokens)
+        else:
+            call["error"] = error.__class__.__name__ if error else "unknown"
+        
+        if self.timer is not None:
+            self.timer.add_call(phase, start, **call)
+    
+    def _system(self, instructions: str) -> List[Dict]:
+        """System prompt blocks for static instructions, marked for prompt caching"""
+        block = {"type": "text", "text": instructions}
+        if self.prompt_cache:
+            block["cache_control"] = {"type": "ephemeral"}
+        return [block]
+    
+    async def _create_message(self, phase: str = "other", image_tokens: int = 0, **kwargs):
+        """Call messages.create with the concurrency limit and retry/backoff
+        
+        Token usage and latency (including retries) are added to
+        `self.usage[phase]` and the call to the job timeline.
+        """
+        semaphore = _get_request_semaphore()
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            try:
+                async with semaphore:
+                    response = await self.client.messages.create(**kwargs)
+                self._record_call(phase, start, response, retries=attempt, image_tokens=image_tokens)
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record_call(phase, start, retries=attempt, image_tokens=image_tokens, error=e)
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"Claude request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                attempt += 1
+                self.retry_count += 1
+                metrics.llm_retries.inc(phase=phase)
+                # Back off without holding a concurrency slot
+                await asyncio.sleep(delay)
+    
+    async def _stream_text(self, phase: str = "other", **kwargs) -> AsyncIterator[str]:
+        """Stream a message's text deltas, with the same limit and retries
+        as _create_message
+        
+        A failed request is only retried if no text has been yielded yet;
+        once the caller has seen part of the answer the error is raised.
+        """
+        semaphore = _get_request_semaphore()
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            first_token = None
+            try:
+                async with semaphore:
+                    async with self.client.messages.stream(**kwargs) as stream:
+                        async for text in stream.text_stream:
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                            yield text
+                        response = await stream.get_final_message()
+                self._record_call(
+                    phase, start, response,
+                    first_token_seconds=first_token,
+                    retries=attempt
+                )
+                return
+            except Exception as e:
+                if first_token is not None or attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record_call(phase, start, first_token_seconds=first_token, retries=attempt, error=e)
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"Claude stream failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                attempt += 1
+                self.retry_count += 1
+                metrics.llm_retries.inc(phase=phase)
+                await asyncio.sleep(delay)
+    
+    @staticmethod
+    def _image_tokens(image_path: Path) -> int:
+        """Estimated input tokens of an image (width * height / 750)"""
+        from PIL import Image
+        
+        # Only the header is read
+        with Image.open(image_path) as img:
+            width, height = img.size
+        return width * height // 750
+    
+    def _render_image(self, image_path: Path) -> bytes:
+        """Resize and re-encode an image as a vision-ready JPEG"""
         from PIL import Image
         import io
         
@@ -26,7 +374,7 @@ class AIService:
         with Image.open(image_path) as img:
             # Get current dimensions
             width, height = img.size
-            max_dimension = 1900  # Keep under 2000 pixel limit
+            max_dimension = self.IMAGE_MAX_DIMENSION
             
             # Resize if any dimension exceeds limit
             if width > max_dimension or height > max_dimension:
@@ -50,96 +398,189 @@ class AIService:
             
             # Save to bytes
             buffer = io.BytesIO()
-            img.save(buffer, format='JPEG', quality=85)
-            buffer.seek(0)
-            
-            return base64.standard_b64encode(buffer.read()).decode("utf-8")
+            img.save(buffer, format='JPEG', quality=self.IMAGE_QUALITY)
+            return buffer.getvalue()
     
-    async def select_key_frames(
-        self, 
-        frames: List[Tuple[float, Path]], 
-        transcript: str
-    ) -> List[Dict]:
-        """Analyze frames and select key moments using Claude Vision"""
+    def _prepare_image(self, image_path: Path) -> Path:
+        """Return the cached vision-ready JPEG for a frame, preparing it on a miss"""
+        key = self.image_cache.key(image_path, self.IMAGE_MAX_DIMENSION, self.IMAGE_QUALITY)
+        cached = self.image_cache.get(key)
+        if cached is not None:
+            return cached
+        return self.image_cache.put(key, self._render_image(image_path))
+    
+    def _encode_image(self, frame: Dict) -> str:
+        """Base64 of a candidate's prepared image
+        
+        Pins only hold within this process, so an entry pruned by another
+        worker since preparation is prepared again from the frame.
+        """
+        try:
+            data = frame["prepared_path"].read_bytes()
+        except FileNotFoundError:
+            frame["prepared_path"] = self._prepare_image(frame["path"])
+            data = frame["prepared_path"].read_bytes()
+        return base64.standard_b64encode(data).decode("ascii")
+    
+    @staticmethod
+    def _log_prune_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Image cache prune failed: {future.exception()!r}")
+    
+    async def prepare_images(self, image_paths: List[Path]) -> List[Path]:
+        """Prepare images in parallel on the bounded image pool
+        
+        The returned cache entries are pinned against pruning until
+        release_images() is called with them.
+        """
+        loop = asyncio.get_event_loop()
+        pool = _get_image_pool()
+        prepared = await asyncio.gather(*[
+            loop.run_in_executor(pool, self._prepare_image, image_path)
+            for image_path in image_paths
+        ])
+        self.image_cache.pin(prepared)
+        # Pruning doesn't hold up the job, but its errors are still reported
+        loop.run_in_executor(pool, self.image_cache.prune).add_done_callback(self._log_prune_error)
+        return prepared
+    
+    def release_images(self, prepared_paths: List[Path]):
+        """Allow prepared images to be pruned again"""
+        self.image_cache.unpin(prepared_paths)
+    
+    def release_frame_candidates(self, candidates: List[Dict]):
+        """Unpin the images of prepare_frame_candidates() once selection is done"""
+        self.release_images([frame["prepared_path"] for frame in candidates])
+    
+    def _frame_windows(self, timestamps: List[float], transcript: Transcript) -> List[str]:
+        """
+        What was said around each frame
+        
+        Each frame gets the stretch of transcript between the midpoints to
+        its neighbouring frames, at most FRAME_CONTEXT_SECONDS either side.
+        Untimed transcripts give no per-frame context.
+        """
+        if not transcript.timed:
+            return [""] * len(timestamps)
+        
+        windows = []
+        for i, timestamp in enumerate(timestamps):
+            before = timestamps[i - 1] if i > 0 else float("-inf")
+            after = timestamps[i + 1] if i + 1 < len(timestamps) else float("inf")
+            start = max((before + timestamp) / 2, timestamp - self.FRAME_CONTEXT_SECONDS)
+            end = min((timestamp + after) / 2, timestamp + self.FRAME_CONTEXT_SECONDS)
+            windows.append(transcript.window(start, end, max_chars=self.FRAME_CONTEXT_CHARS))
+        return windows
+    
+    async def prepare_frame_candidates(self, frames: List[Tuple[float, Path]]) -> List[Dict]:
+        """
+        Pick the frames to send for selection and prepare their images
+        
+        Doesn't need the transcript, so it can run while audio is still
+        being transcribed. The prepared images stay pinned in the cache
+        until release_frame_candidates().
+        """
         
         # Limit to analyzing every Nth frame to avoid too many API calls
-        # Analyze max 20 frames
-        step = max(1, len(frames) // 20)
+        # Analyze max MAX_VISION_FRAMES frames (VideoProcessor already plans
+        # its sampling around this budget, so normally nothing is dropped)
+        step = max(1, -(-len(frames) // self.max_vision_frames))
         frames_to_analyze = frames[::step]
         
-        # Prepare frames for analysis
-        frame_contents = []
-        for timestamp, frame_path in frames_to_analyze:
-            image_data = self._encode_image(frame_path)
-            frame_contents.append({
+        # Prepare frames for analysis (resized JPEGs, cached on disk)
+        prepared_paths = await self.prepare_images(
+            [frame_path for _, frame_path in frames_to_analyze]
+        )
+        return [
+            {
                 "timestamp": timestamp,
                 "path": frame_path,
-                "image_data": image_data
-            })
+                "prepared_path": prepared_path
+            }
+            for (timestamp, frame_path), prepared_path in zip(frames_to_analyze, prepared_paths)
+        ]
+    
+    async def select_key_frames(
+        self, 
+        frames: List[Tuple[float, Path]], 
+        transcript: Transcript,
+        candidates: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Analyze frames and select key moments using Claude Vision
+        
+        With a timed transcript, every frame is sent together with what was
+        being said around it instead of one truncated transcript excerpt.
+        
+        Args:
+            frames: (timestamp, path) pairs in time order
+            transcript: Transcript so far; frames past its end get no context
+            candidates: Result of prepare_frame_candidates(frames), if
+                already prepared
+        """
+        
+        if candidates is None:
+            candidates = await self.prepare_frame_candidates(frames)
+            try:
+                return await self.select_key_frames(frames, transcript, candidates)
+            finally:
+                self.release_frame_candidates(candidates)
+        if not candidates:
+            # Dedup or scene detection can leave nothing to choose from
+            print("No candidate frames to select from")
+            return []
+        windows = self._frame_windows([frame["timestamp"] for frame in candidates], transcript)
+        frame_contents = [
+            {**frame, "transcript_window": window}
+            for frame, window in zip(candidates, windows)
+        ]
+        
+        if transcript.timed:
+            transcript_context = "Each frame below is followed by what was being said in the video around that moment."
+        else:
+            transcript_context = f"Video Transcript:\n{transcript.text[:self.TRANSCRIPT_EXCERPT_CHARS]}..."
         
         # Build message with all frames
         message_content = [
             {
                 "type": "text",
-                "text": f"""You are analyzing frames from a video to select the most important moments for a newsletter article.
-
-Video Transcript:
-{transcript[:2000]}...
-
-I'm providing you with {len(frame_contents)} frames extracted from the video. Please analyze these frames and identify the 5-8 most visually interesting and relevant frames that would work well as screenshots in a newsletter article.
-
-IMPORTANT RESTRICTION: **DO NOT select any frames that contain people, faces, or human figures.** Only select frames that show:
-- Slides/presentations (without people)
-- Diagrams and charts
-- Text and graphics
-- Objects and products
-- Landscapes and scenery
-- Computer screens showing content
-- Any visual content WITHOUT people
-
-If a frame contains any person (even partially visible), skip it and choose a different frame.
-
-For each selected frame, provide:
-1. The frame number (0-{len(frame_contents)-1})
-2. A brief description of what makes it important
-3. A caption in English
-4. Confirmation that it contains no people
+                "text": f"""{transcript_context}
 
-Respond in JSON format:
-{{
-  "selected_frames": [
-    {{
-      "frame_index": 0,
-      "reason": "Shows the main topic introduction slide with no people",
-      "caption": "Introduction to the topic",
-      "contains_people": false
-    }}
-  ]
-}}"""
+I'm providing you with {len(frame_contents)} frames, numbered 0-{len(frame_contents)-1}."""
             }
         ]
         
-        # Add all frame images
+        # Add all frame images. Each payload is read and encoded right before
+        # it is appended, so only the base64 strings in the body stay alive
+        image_tokens = 0
         for i, frame in enumerate(frame_contents):
+            frame_header = f"\n--- Frame {i} (at {frame['timestamp']}s) ---"
+            if frame["transcript_window"]:
+                frame_header += f"\nSpoken around this frame: \"{frame['transcript_window']}\""
             message_content.append({
                 "type": "text",
-                "text": f"\n--- Frame {i} (at {frame['timestamp']}s) ---"
+                "text": frame_header
             })
             message_content.append({
                 "type": "image",
                 "source": {
                     "type": "base64",
                     "media_type": "image/jpeg",
-                    "data": frame["image_data"]
+                    "data": self._encode_image(frame)
                 }
             })
+            image_tokens += self._image_tokens(frame["prepared_path"])
         
         # Call Claude API
-        response = self.client.messages.create(
+        response = await self._create_message(
+            phase="selection",
+            image_tokens=image_tokens,
             model=self.model,
             max_tokens=2000,
+            system=self._system(SELECTION_INSTRUCTIONS),
             messages=[{"role": "user", "content": message_content}]
         )
+        # Free the payloads before parsing the answer
+        del message_content
         
         # Parse response
         import json
@@ -168,7 +609,8 @@ Respond in JSON format:
                         "timestamp": frame_data["timestamp"],
                         "path": frame_data["path"],
                         "caption": selection["caption"],
-                        "reason": selection["reason"]
+                        "reason": selection["reason"],
+                        "transcript_window": frame_data["transcript_window"]
                     })
             
             return selected_frames
@@ -183,81 +625,168 @@ Respond in JSON format:
                     "timestamp": frame_contents[i * step]["timestamp"],
                     "path": frame_contents[i * step]["path"],
                     "caption": f"Frame at {frame_contents[i * step]['timestamp']}s",
-                    "reason": "Auto-selected"
+                    "reason": "Auto-selected",
+                    "transcript_window": frame_contents[i * step]["transcript_window"]
                 }
                 for i in range(num_frames)
             ]
     
+    async def count_tokens(self, text: str) -> int:
+        """
+        Estimate the token count of a text
+        
+        Uses the SDK's local tokenizer (approximate for current models) and
+        falls back to ~4 characters per token when it can't be loaded.
+        """
+        global _tokenizer_available
+        if _tokenizer_available is not False:
+            try:
+                tokens = await self.client.count_tokens(text)
+                _tokenizer_available = True
+                return tokens
+            except Exception as e:
+                _tokenizer_available = False
+                print(f"Tokenizer unavailable ({e.__class__.__name__}), estimating tokens from length")
+        return len(text) // 4 + 1
+    
+    @staticmethod
+    def _format_time(seconds: float) -> str:
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}:{seconds:02d}"
+    
+    async def _summarise_chunk(
+        self,
+        chunk: Transcript,
+        index: int,
+        total: int,
+        semaphore: asyncio.Semaphore
+    ) -> str:
+        """Map step: detailed English notes on one part of the transcript"""
+        time_range = ""
+        if chunk.timed and len(chunk):
+            time_range = f" (from {self._format_time(chunk.starts[0])} to {self._format_time(chunk.duration)})"
+        
+        prompt = f"""Part {index + 1} of {total} of the transcript{time_range}:
+{chunk.text}"""
+        
+        async with semaphore:
+            response = await self._create_message(
+                phase="map",
+                model=self.model,
+                max_tokens=self.summary_max_tokens,
+                system=self._system(MAP_INSTRUCTIONS),
+                messages=[{"role": "user", "content": prompt}]
+            )
+        return f"Part {index + 1}{time_range}:\n{response.content[0].text.strip()}"
+    
+    async def condense_transcript(self, transcript: Transcript, max_rounds: int = 2) -> str:
+        """
+        Reduce a long transcript to ordered notes that fit the article prompt
+        
+        The transcript is split into chunks of about ARTICLE_CHUNK_TOKENS,
+        which are summarised concurrently (at most ARTICLE_MAP_CONCURRENCY
+        at a time). If the merged notes are still over
+        ARTICLE_LONG_INPUT_TOKENS, they are condensed again.
+        """
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+        text = transcript.text
+        for _ in range(max_rounds):
+            tokens = await self.count_tokens(text)
+            chars_per_token = len(text) / max(tokens, 1)
+            chunks = transcript.split(int(self.chunk_tokens * chars_per_token))
+            
+            start = time.perf_counter()
+            summaries = await asyncio.gather(*[
+                self._summarise_chunk(chunk, i, len(chunks), semaphore)
+                for i, chunk in enumerate(chunks)
+            ])
+            # Calls overlap, so also keep the elapsed time of the whole phase
+            map_stats = self.usage["map"]
+            map_stats["wall_seconds"] = round(
+                map_stats.get("wall_seconds", 0.0) + time.perf_counter() - start, 3
+            )
+            
+            text = "\n\n".join(summaries)
+            if await self.count_tokens(text) <= self.long_input_tokens:
+                break
+            transcript = Transcript.from_text(text)
+        return text
+    
     async def generate_newsletter_content(
         self, 
-        transcript: str, 
+        transcript: Transcript, 
         key_frames: List[Dict]
     ) -> str:
         """Generate newsletter article in Slovenian based on transcript and key frames"""
+        parts = []
+        async for text in self.stream_newsletter_content(transcript, key_frames):
+            parts.append(text)
+        return "".join(parts)
+    
+    async def stream_newsletter_content(
+        self,
+        transcript: Transcript,
+        key_frames: List[Dict]
+    ) -> AsyncIterator[str]:
+        """Stream the Slovenian newsletter article as it is written
         
-        # Prepare frame descriptions
+        Transcripts over ARTICLE_LONG_INPUT_TOKENS are first condensed into
+        notes (map-reduce) and the article is written from those.
+        
+        Yields:
+            Text deltas of the article
+        """
+        
+        if await self.count_tokens(transcript.text) > self.long_input_tokens:
+            source = f"Detailed notes on the video, in order (English):\n{await self.condense_transcript(transcript)}"
+        else:
+            source = f"Video Transcript (English):\n{transcript.text}"
+        
+        # Prepare frame descriptions, with what was said at each frame when known
         frame_descriptions = "\n".join([
             f"- Frame at {f['timestamp']}s: {f['caption']} ({f['reason']})"
+            + (f"\n  Said at this moment: \"{f['transcript_window']}\"" if f.get("transcript_window") else "")
             for f in key_frames
         ])
         
-        prompt = f"""You are a professional newsletter writer. Create a comprehensive newsletter article in Slovenian language based on the following English video content.
-
-Video Transcript (English):
-{transcript}
+        prompt = f"""{source}
 
 Key Visual Moments:
-{frame_descriptions}
-
-Instructions:
-1. Write the article entirely in Slovenian language
-2. The article should be well-structured with a title, introduction, main content sections, and conclusion
-3. The article should be approximately 800-1200 words
-4. Create natural transitions between sections
-5. The tone should be informative and engaging
-6. Include relevant context and explanations
-7. Make it suitable for a newsletter format
-
-Important: Write ONLY the article content in Slovenian. Do not include any English text, explanations, or meta-commentary."""
+{frame_descriptions}"""
 
-        response = self.client.messages.create(
+        async for text in self._stream_text(
+            phase="article",
             model=self.model,
             max_tokens=4000,
+            system=self._system(ARTICLE_INSTRUCTIONS),
             messages=[{"role": "user", "content": prompt}]
-        )
-        
-        return response.content[0].text
+        ):
+            yield text
     
-    async def proofread_slovenian(self, article_text: str) -> str:
-        """Proofread and improve Slovenian text quality"""
+    async def proofread_slovenian(self, paragraph: str, max_tokens: int = 4500) -> str:
+        """Proofread and improve the Slovenian of one paragraph
         
-        prompt = f"""Ti si strokovni učitelj slovenskega jezika in lektor. Tvoja naloga je pregledati in popraviti članek v slovenščini.
-
-ČLANEK ZA PREGLED:
-{article_text}
-
-NAVODILA:
-1. Preglej celoten članek za slovnične napake
-2. Popravi morebitne napake v sklanjanju, spreganju, ločilih
-3. Izboljšaj slog in naravnost slovenskega jezika
-4. Poskrbi, da se besedilo bere tekoče in naravno
-5. Ohrani strukturo in pomen originalnega besedila
-6. Popravi morebitne anglizme v bolj naravno slovenščino
-7. Preveri pravilno uporabo slovenskih znakov (č, š, ž)
-
-POMEMBNO: 
-- Vrni SAMO popravljen članek v slovenščini
-- Ne dodajaj komentarjev, opomb ali razlag
-- Ohrani vse naslove, odstavke in strukturo
-- Ne dodajaj novih vsebin, samo popravi obstoječe
+        Args:
+            paragraph: One block of the article, without its heading (see Proofreader)
+            max_tokens: Output limit; roughly the length of the input
+        """
+        
+        prompt = f"""ODSTAVEK ZA PREGLED:
+{paragraph}
 
-Vrni popravljen članek:"""
+Vrni samo popravljen odstavek:"""
 
-        response = self.client.messages.create(
+        # Streamed so a long paragraph doesn't sit on an idle connection
+        # until the whole answer is ready
+        parts = []
+        async for text in self._stream_text(
+            phase="proofread",
             model=self.model,
-            max_tokens=4500,
+            max_tokens=max_tokens,
+            system=self._system(PROOFREAD_INSTRUCTIONS),
             messages=[{"role": "user", "content": prompt}]
-        )
+        ):
+            parts.append(text)
         
-        return response.content[0].text.strip()
+        return "".join(parts).strip()
 
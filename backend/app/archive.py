@@ -0,0 +1,97 @@
+import os
+import asyncio
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Already-compressed formats gain nothing from deflate, so they are stored
+STORED_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".gif", ".docx", ".zip"}
+
+
+def _output_files(output_dir: Path) -> List[Path]:
+    return sorted(path for path in output_dir.rglob("*") if path.is_file())
+
+
+def output_fingerprint(output_dir: Path) -> str:
+    """Digest of the names, sizes and modification times of a job's output files"""
+    digest = hashlib.sha256()
+    for path in _output_files(output_dir):
+        stat = path.stat()
+        digest.update(
+            f"{path.relative_to(output_dir).as_posix()}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode()
+        )
+    return digest.hexdigest()[:32]
+
+
+def archive_fingerprint(zip_path: Path) -> Optional[str]:
+    """Fingerprint an archive was built from (kept in the zip comment)"""
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            return archive.comment.decode() or None
+    except (FileNotFoundError, zipfile.BadZipFile):
+        return None
+
+
+def build_archive(output_dir: Path, zip_path: Path, fingerprint: str) -> Path:
+    """
+    Zip a job's output directory
+
+    The archive is written to a temporary file and renamed into place, so a
+    download never sees a half-written zip, and concurrent builders (e.g.
+    in other worker processes) at worst do the work twice.
+    """
+    tmp_path = zip_path.with_name(f"{zip_path.name}.{os.getpid()}.{id(fingerprint)}.tmp")
+    try:
+        with zipfile.ZipFile(tmp_path, "w") as archive:
+            for path in _output_files(output_dir):
+                compress_type = (
+                    zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+                )
+                archive.write(path, path.relative_to(output_dir).as_posix(), compress_type=compress_type)
+            archive.comment = fingerprint.encode()
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return zip_path
+
+
+class ArchiveStore:
+    """
+    Download archives of job outputs, built once and reused
+
+    An archive is rebuilt only when the fingerprint of the job's output
+    files changes. Builds run in a worker thread, and a per-job lock makes
+    concurrent requests for the same job wait for a single build.
+    """
+
+    def __init__(self, output_root: Path):
+        self.output_root = output_root
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def zip_path(self, job_id: str) -> Path:
+        return self.output_root / f"{job_id}_newsletter.zip"
+
+    async def get(self, job_id: str) -> Tuple[Path, str]:
+        """
+        Up-to-date archive of a job's output
+
+        Returns:
+            (zip_path, fingerprint)
+        """
+        output_dir = self.output_root / job_id
+        zip_path = self.zip_path(job_id)
+        loop = asyncio.get_running_loop()
+        lock = self._locks.setdefault(job_id, asyncio.Lock())
+        async with lock:
+            fingerprint = await loop.run_in_executor(None, output_fingerprint, output_dir)
+            if await loop.run_in_executor(None, archive_fingerprint, zip_path) != fingerprint:
+                await loop.run_in_executor(None, build_archive, output_dir, zip_path, fingerprint)
+        return zip_path, fingerprint
+
+    def discard(self, job_id: str):
+        """Delete a job's archive"""
+        self._locks.pop(job_id, None)
+        self.zip_path(job_id).unlink(missing_ok=True)
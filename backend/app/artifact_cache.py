@@ -0,0 +1,232 @@
+import os
+import json
+import asyncio
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class ArtifactCache:
+    """
+    Persistent, content-addressed cache of pipeline stage outputs
+
+    Each stage (transcript, frames, article) is stored separately under
+    `cache_dir/{stage}/{key}/` as a `meta.json` plus any files it needs, so a
+    repeat job reuses every stage whose inputs and settings are unchanged.
+    Keys are built with make_key() from the source identity (upload hash or
+    YouTube video ID) and the settings that affect the stage. Least recently
+    used entries are evicted once the cache exceeds `max_bytes`; the
+    eviction scan runs at most every `prune_interval` seconds.
+
+    Eviction doesn't know which entries running jobs use, so jobs take
+    hard links to an entry's files (get()'s files_dir) rather than reading
+    them from inside the cache.
+
+    get() and put() do blocking file I/O; async code uses get_async() and
+    put_async(), which run them in a worker thread.
+    """
+
+    STAGES = ("transcript", "frames", "article")
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or Path(os.getenv("ARTIFACT_CACHE_DIR", "cache/artifacts"))
+        self.max_bytes = max_bytes or int(os.getenv("ARTIFACT_CACHE_MAX_MB", 2048)) * 1024 * 1024
+        self.enabled = os.getenv("ARTIFACT_CACHE", "true").lower() == "true"
+        self.prune_interval = float(os.getenv("ARTIFACT_CACHE_PRUNE_SECONDS", 60))
+        self._last_prune = float("-inf")
+
+        self._lock = threading.Lock()
+        self._counters = {stage: {"hits": 0, "misses": 0} for stage in self.STAGES}
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Stable hash of the stage inputs and settings"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, stage: str, key: str) -> Path:
+        return self.cache_dir / stage / key
+
+    def contains(self, stage: str, key: str) -> bool:
+        return self.enabled and (self._entry_dir(stage, key) / "meta.json").exists()
+
+    def get(self, stage: str, key: Optional[str], files_dir: Optional[Path] = None) -> Optional[dict]:
+        """
+        Load a cached stage output
+
+        Args:
+            stage: One of STAGES
+            key: Key from make_key()
+            files_dir: Directory to hard-link (or copy) the entry's files
+                into. Entries can be evicted while a job still uses them, so
+                a job should take its own links instead of reading files
+                from inside the cache.
+
+        Returns:
+            The stored data, with "files" mapped to absolute paths (inside
+            files_dir if given, else inside the entry), or None on a miss
+        """
+        if not self.enabled or key is None:
+            return None
+
+        meta_path = self._entry_dir(stage, key) / "meta.json"
+        try:
+            entry = json.loads(meta_path.read_text(encoding="utf-8"))
+            # Mark as recently used for eviction
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count(stage, "misses")
+            return None
+
+        entry["files"] = {
+            name: meta_path.parent / filename
+            for name, filename in entry.get("files", {}).items()
+        }
+        if files_dir is not None and entry["files"]:
+            try:
+                entry["files"] = self._link_files(entry["files"], files_dir)
+            except FileNotFoundError:
+                # Evicted between reading meta.json and linking its files
+                self._count(stage, "misses")
+                return None
+        self._count(stage, "hits")
+        return entry
+
+    @staticmethod
+    def _link_files(files: Dict[str, Path], files_dir: Path) -> Dict[str, Path]:
+        files_dir.mkdir(parents=True, exist_ok=True)
+        linked = {}
+        try:
+            for name, source in files.items():
+                target = files_dir / source.name
+                target.unlink(missing_ok=True)
+                try:
+                    os.link(source, target)
+                except OSError:
+                    # No hard links across filesystems (a missing source
+                    # fails again in copyfile)
+                    shutil.copyfile(source, target)
+                linked[name] = target
+        except FileNotFoundError:
+            shutil.rmtree(files_dir, ignore_errors=True)
+            raise
+        return linked
+
+    def put(
+        self,
+        stage: str,
+        key: Optional[str],
+        data: dict,
+        files: Optional[Dict[str, Path]] = None
+    ) -> Optional[dict]:
+        """
+        Store a stage output
+
+        Args:
+            stage: One of STAGES
+            key: Key from make_key()
+            data: JSON-serialisable payload
+            files: Named files to copy into the entry
+
+        Returns:
+            The stored entry (as get() would return it)
+        """
+        if not self.enabled or key is None:
+            return None
+
+        entry_dir = self._entry_dir(stage, key)
+        tmp_dir = entry_dir.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        stored_files = {}
+        for name, source in (files or {}).items():
+            filename = f"{name}{Path(source).suffix}"
+            shutil.copyfile(source, tmp_dir / filename)
+            stored_files[name] = filename
+
+        entry = {**data, "files": stored_files, "created_at": time.time()}
+        (tmp_dir / "meta.json").write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+
+        # Publish atomically; if another job stored the same entry first, keep theirs
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._maybe_prune()
+        return {
+            **entry,
+            "files": {name: entry_dir / filename for name, filename in stored_files.items()},
+        }
+
+    async def get_async(
+        self,
+        stage: str,
+        key: Optional[str],
+        files_dir: Optional[Path] = None
+    ) -> Optional[dict]:
+        """get() off the event loop"""
+        if not self.enabled or key is None:
+            return None
+        return await asyncio.to_thread(self.get, stage, key, files_dir)
+
+    async def put_async(
+        self,
+        stage: str,
+        key: Optional[str],
+        data: dict,
+        files: Optional[Dict[str, Path]] = None
+    ) -> Optional[dict]:
+        """put() off the event loop"""
+        if not self.enabled or key is None:
+            return None
+        return await asyncio.to_thread(self.put, stage, key, data, files)
+
+    def _count(self, stage: str, outcome: str):
+        with self._lock:
+            self._counters[stage][outcome] += 1
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        for stage in self.STAGES:
+            stage_dir = self.cache_dir / stage
+            if not stage_dir.exists():
+                continue
+            for entry_dir in stage_dir.iterdir():
+                meta_path = entry_dir / "meta.json"
+                if entry_dir.name.startswith(".") or not meta_path.exists():
+                    continue
+                size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+                entries.append((meta_path.stat().st_mtime, size, entry_dir))
+        return entries
+
+    def _maybe_prune(self):
+        """Prune unless the last scan was less than prune_interval ago"""
+        with self._lock:
+            if time.monotonic() - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = time.monotonic()
+        self.prune()
+
+    def prune(self):
+        """Evict least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+
+    def stats(self) -> dict:
+        """Hit/miss counters per stage"""
+        with self._lock:
+            counters = {stage: dict(values) for stage, values in self._counters.items()}
+        for values in counters.values():
+            lookups = values["hits"] + values["misses"]
+            values["hit_rate"] = round(values["hits"] / lookups, 3) if lookups else None
+        return {"enabled": self.enabled, "max_bytes": self.max_bytes, "stages": counters}
@@ -0,0 +1,151 @@
+"""
+Pipeline micro-benchmarks
+
+Usage (from backend/):
+    python -m app.benchmarks extraction --duration 300
+    python -m app.benchmarks transcription --media talk.mp4 --workers 4
+"""
+import os
+import argparse
+import asyncio
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.job_scheduler import transcribe_workers
+from app.video_processor import VideoProcessor
+from app.transcription import SAMPLE_RATE, TranscriptionEngine, transcription_settings
+from app.whisper_registry import warm_up_worker
+
+
+def make_test_video(path: Path, duration: int, size: str = "1280x720") -> Path:
+    """Render a synthetic video with a moving test pattern and a sine tone"""
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        str(path)
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return path
+
+
+async def _time(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def _two_pass(processor: VideoProcessor):
+    await processor.extract_audio()
+    await processor.extract_frames()
+
+
+def bench_extraction(duration: int, runs: int):
+    """Compare sequential, concurrent and single-pass audio/frame extraction"""
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_extract_"))
+    try:
+        video_path = make_test_video(work_dir / "synthetic.mp4", duration)
+        processor = VideoProcessor(video_path)
+        processor.frame_sampling = "interval"
+
+        results = {"two_pass": [], "concurrent": [], "single_pass": []}
+        for _ in range(runs):
+            results["two_pass"].append(asyncio.run(_time(_two_pass(processor))))
+            shutil.rmtree(processor._frames_dir())
+            for mode in ("concurrent", "single_pass"):
+                processor.extraction_mode = mode
+                results[mode].append(
+                    asyncio.run(_time(processor.extract_audio_and_frames()))
+                )
+                shutil.rmtree(processor._frames_dir())
+
+        print(f"Synthetic video: {duration}s, frame interval {processor.frame_interval}s, {runs} runs")
+        baseline = min(results["two_pass"])
+        for name, timings in results.items():
+            print(
+                f"  {name:<12} best {min(timings):6.2f}s  mean {sum(timings) / len(timings):6.2f}s"
+                f"  speedup {baseline / min(timings):.2f}x"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _time_transcription(audio_path: Path, mode: str, workers: int, runs: int) -> list:
+    """Time one transcription mode in its own pool of `workers` processes"""
+    # Inherited by the spawned workers, so each gets its share of the cores
+    # (all of them for a single worker, as in production)
+    os.environ["TRANSCRIBE_WORKERS"] = str(workers)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        # Load the model in every worker so load time isn't measured
+        for future in [pool.submit(warm_up_worker) for _ in range(workers)]:
+            future.result()
+
+        engine = TranscriptionEngine({**transcription_settings(), "mode": mode})
+        return [asyncio.run(_time(engine.transcribe(audio_path, pool))) for _ in range(runs)]
+    finally:
+        pool.shutdown()
+
+
+def bench_transcription(media_path: Path, workers: int, runs: int):
+    """Compare real-time factor of single-call and chunked transcription
+
+    The single-call baseline runs the way production runs it with one
+    worker: one process using every core. Chunked runs on `workers`
+    processes sharing the cores.
+    """
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_transcribe_"))
+    try:
+        media_copy = work_dir / media_path.name
+        shutil.copyfile(media_path, media_copy)
+        audio_path = asyncio.run(VideoProcessor(media_copy).extract_audio())
+        audio_seconds = audio_path.stat().st_size / 2 / SAMPLE_RATE
+
+        chunks = len(TranscriptionEngine().plan(audio_path))
+        results = {
+            ("single", 1): _time_transcription(audio_path, "single", 1, runs),
+            ("chunked", workers): _time_transcription(audio_path, "chunked", workers, runs),
+        }
+
+        print(f"{media_path.name}: {audio_seconds:.0f}s of audio, {chunks} chunks, {runs} runs")
+        baseline = min(results[("single", 1)])
+        for (name, mode_workers), timings in results.items():
+            print(
+                f"  {name:<8} {mode_workers:>2} workers  best {min(timings):7.2f}s"
+                f"  RTF {min(timings) / audio_seconds:.3f}  speedup {baseline / min(timings):.2f}x"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    extraction = subparsers.add_parser("extraction", help="ffmpeg audio/frame extraction")
+    extraction.add_argument("--duration", type=int, default=300, help="Video length in seconds")
+    extraction.add_argument("--runs", type=int, default=3)
+
+    transcription = subparsers.add_parser("transcription", help="Whisper transcription real-time factor")
+    transcription.add_argument("--media", type=Path, required=True, help="Audio or video file with speech")
+    transcription.add_argument(
+        "--workers", type=int, default=transcribe_workers(), help="Worker processes for chunked mode"
+    )
+    transcription.add_argument("--runs", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.benchmark == "extraction":
+        bench_extraction(args.duration, args.runs)
+    elif args.benchmark == "transcription":
+        bench_transcription(args.media, args.workers, args.runs)
+
+
+if __name__ == "__main__":
+    main()
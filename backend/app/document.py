@@ -0,0 +1,167 @@
+"""
+Intermediate document model for newsletter markdown
+
+The markdown is parsed once into a list of blocks that every export
+renderer consumes, so a new format only needs a renderer. Blocks are
+dicts with a "type":
+
+    heading    level, spans
+    paragraph  spans (line breaks stay as newlines inside span text)
+    image      src, alt, caption (spans, may be empty)
+    list       ordered, items (list of spans)
+    quote      spans
+    code       text
+    table      header (list of spans), rows (list of list of spans)
+    rule
+
+Spans are dicts with "text" and the flags "bold", "italic", "code" and
+"href" (link target or None).
+"""
+
+import re
+from typing import Dict, List, Optional
+
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*$")
+_IMAGE = re.compile(r"^!\[(.*?)\]\((\S+?)(?:\s+\"[^\"]*\")?\)$")
+_CAPTION = re.compile(r"^\*([^*].*?)\*$|^_([^_].*?)_$")
+_LIST_ITEM = re.compile(r"^(?:[-*+]|(\d+)[.)])\s+(.*)$")
+_RULE = re.compile(r"^([-*_])(\s*\1){2,}$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+_INLINE = re.compile(
+    r"\*\*(?P<bold>.+?)\*\*"
+    r"|(?<![\w*])\*(?P<italic>[^*\s](?:.*?[^*\s])?)\*(?![\w*])"
+    r"|`(?P<code>[^`]+)`"
+    r"|\[(?P<label>[^\]]+)\]\((?P<href>[^)\s]+)\)"
+)
+
+
+def _span(text: str, bold=False, italic=False, code=False, href: Optional[str] = None) -> Dict:
+    return {"text": text, "bold": bold, "italic": italic, "code": code, "href": href}
+
+
+def parse_inlines(text: str, bold=False, italic=False, href: Optional[str] = None) -> List[Dict]:
+    """Split text into styled spans (bold, italic, inline code, links)"""
+    spans = []
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            spans.append(_span(text[position:match.start()], bold, italic, href=href))
+        if match.group("bold") is not None:
+            spans.extend(parse_inlines(match.group("bold"), True, italic, href))
+        elif match.group("italic") is not None:
+            spans.extend(parse_inlines(match.group("italic"), bold, True, href))
+        elif match.group("code") is not None:
+            spans.append(_span(match.group("code"), bold, italic, code=True, href=href))
+        else:
+            spans.extend(parse_inlines(match.group("label"), bold, italic, match.group("href")))
+        position = match.end()
+    if position < len(text):
+        spans.append(_span(text[position:], bold, italic, href=href))
+    return spans
+
+
+def _table_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _starts_block(line: str) -> bool:
+    """Whether a line begins a block other than a paragraph"""
+    return bool(
+        _HEADING.match(line) or _IMAGE.match(line) or _LIST_ITEM.match(line)
+        or _RULE.match(line) or line.startswith((">", "```"))
+    )
+
+
+def parse_markdown(text: str) -> List[Dict]:
+    """Parse newsletter markdown into blocks (see module docstring)"""
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    blocks: List[Dict] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+
+        if line.startswith("```"):
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code.append(lines[i])
+                i += 1
+            blocks.append({"type": "code", "text": "\n".join(code)})
+            i += 1
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            blocks.append({
+                "type": "heading",
+                "level": len(heading.group(1)),
+                "spans": parse_inlines(heading.group(2)),
+            })
+            i += 1
+            continue
+
+        image = _IMAGE.match(line)
+        if image:
+            caption: List[Dict] = []
+            i += 1
+            # An italic line right below an image is its caption
+            if i < len(lines):
+                caption_match = _CAPTION.match(lines[i].strip())
+                if caption_match:
+                    caption = parse_inlines(caption_match.group(1) or caption_match.group(2))
+                    i += 1
+            blocks.append({"type": "image", "alt": image.group(1), "src": image.group(2), "caption": caption})
+            continue
+
+        if _RULE.match(line):
+            blocks.append({"type": "rule"})
+            i += 1
+            continue
+
+        if _LIST_ITEM.match(line):
+            ordered = _LIST_ITEM.match(line).group(1) is not None
+            items = []
+            while i < len(lines):
+                item = _LIST_ITEM.match(lines[i].strip())
+                if item and (item.group(1) is not None) == ordered:
+                    items.append(parse_inlines(item.group(2)))
+                elif lines[i].startswith((" ", "\t")) and lines[i].strip() and items:
+                    # Continuation of the previous item
+                    items[-1].extend(parse_inlines(" " + lines[i].strip()))
+                else:
+                    break
+                i += 1
+            blocks.append({"type": "list", "ordered": ordered, "items": items})
+            continue
+
+        if line.startswith(">"):
+            quote = []
+            while i < len(lines) and lines[i].strip().startswith(">"):
+                quote.append(lines[i].strip()[1:].strip())
+                i += 1
+            blocks.append({"type": "quote", "spans": parse_inlines("\n".join(quote))})
+            continue
+
+        if "|" in line and i + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[i + 1].strip()):
+            header = [parse_inlines(cell) for cell in _table_cells(line)]
+            rows = []
+            i += 2
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                rows.append([parse_inlines(cell) for cell in _table_cells(lines[i])])
+                i += 1
+            blocks.append({"type": "table", "header": header, "rows": rows})
+            continue
+
+        # Paragraph: consecutive lines up to a blank line or another block
+        paragraph = [line]
+        i += 1
+        while i < len(lines) and lines[i].strip() and not _starts_block(lines[i].strip()):
+            paragraph.append(lines[i].strip())
+            i += 1
+        blocks.append({"type": "paragraph", "spans": parse_inlines("\n".join(paragraph))})
+
+    return blocks
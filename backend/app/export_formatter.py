@@ -1,34 +1,237 @@
-import markdown2
+import io
+import os
+import html
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, Dict, List, Optional, Tuple
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-import re
+from PIL import Image
+from app.document import parse_markdown
+from app.image_variants import MODERN_FORMATS, find_variants
+
+
+# Registered export formats: name -> filename, media_type and renderer.
+# A renderer takes the parsed document and the output directory (for
+# images) and returns the file contents; None means the file is the
+# markdown source itself.
+FORMATS: Dict[str, Dict] = {}
+
+# Rendered width of images in the HTML (the body is at most 800px wide)
+IMAGE_SIZES = "(max-width: 840px) 100vw, 800px"
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+# Renders in progress, so concurrent requests share one
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def register_format(name: str, filename: str, media_type: str):
+    """Decorator registering a renderer for an export format"""
+    def decorator(render: Optional[Callable[[List[Dict], Path], bytes]]):
+        FORMATS[name] = {"filename": filename, "media_type": media_type, "render": render}
+        return render
+    return decorator
+
+
+register_format("markdown", "newsletter.md", "text/markdown")(None)
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Pool rendering export formats (python-docx is pure Python and holds the GIL)"""
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(
+            max_workers=int(os.getenv("EXPORT_WORKERS", 2)),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _render_pool
+
+
+def render_formats(output_dir: str, names: List[str]) -> Dict[str, str]:
+    """Render formats of one newsletter (process pool entry point)"""
+    paths = ExportFormatter(Path(output_dir)).render(names)
+    return {name: str(path) for name, path in paths.items()}
 
 
 class ExportFormatter:
-    """Handles exporting newsletters in multiple formats"""
-    
+    """
+    Handles exporting newsletters in multiple formats
+
+    newsletter.md is the source. Other formats are rendered from one parse
+    of it into the document model (app.document) when they are first
+    requested, and the rendered files double as the cache: a format is
+    re-rendered only when the markdown is newer than it.
+    """
+
     def __init__(self, output_dir: Path):
         self.output_dir = output_dir
-    
-    def create_html(self, markdown_content: str, output_filename: str = "newsletter.html") -> Path:
-        """Convert markdown to HTML format for Notion/web browsers"""
-        
-        # Convert markdown to HTML with extras
-        html_content = markdown2.markdown(
-            markdown_content,
-            extras=["fenced-code-blocks", "tables", "break-on-newline"]
+
+    def path(self, name: str) -> Path:
+        return self.output_dir / FORMATS[name]["filename"]
+
+    def is_current(self, name: str) -> bool:
+        """Whether a format's file exists and is up to date with the markdown"""
+        if FORMATS[name]["render"] is None:
+            return True
+        try:
+            return self.path(name).stat().st_mtime_ns >= self.path("markdown").stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+
+    def render(self, names: Optional[List[str]] = None) -> Dict[str, Path]:
+        """
+        Render formats that are missing or stale (blocking)
+
+        Args:
+            names: Formats to render (default: all registered)
+
+        Returns:
+            Path per requested format
+        """
+        names = list(FORMATS) if names is None else names
+        stale = [name for name in names if not self.is_current(name)]
+        if stale:
+            document = parse_markdown(self.path("markdown").read_text(encoding="utf-8"))
+            for name in stale:
+                content = FORMATS[name]["render"](document, self.output_dir)
+                # Write atomically so a download never gets a partial file
+                tmp_path = self.path(name).with_name(f"{FORMATS[name]['filename']}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, self.path(name))
+        return {name: self.path(name) for name in names}
+
+    async def get(self, name: str) -> Path:
+        """Path of a format, rendering it in the worker pool first if needed"""
+        if self.is_current(name):
+            return self.path(name)
+
+        key = (str(self.output_dir), name)
+        future = _in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(_get_render_pool(), render_formats, str(self.output_dir), [name])
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _in_flight.pop(key, None))
+        # One waiter giving up mustn't cancel the render for the others
+        await asyncio.shield(future)
+        return self.path(name)
+
+    async def get_all(self) -> Dict[str, Path]:
+        """Paths of every format, rendering the missing ones in parallel"""
+        paths = await asyncio.gather(*(self.get(name) for name in FORMATS))
+        return dict(zip(FORMATS, paths))
+
+
+def _html_spans(spans: List[Dict]) -> str:
+    parts = []
+    for span in spans:
+        text = html.escape(span["text"]).replace("\n", "<br />\n")
+        if span["code"]:
+            text = f"<code>{text}</code>"
+        if span["italic"]:
+            text = f"<em>{text}</em>"
+        if span["bold"]:
+            text = f"<strong>{text}</strong>"
+        if span["href"]:
+            text = f'<a href="{html.escape(span["href"])}">{text}</a>'
+        parts.append(text)
+    return "".join(parts)
+
+
+def _plain_text(spans: List[Dict]) -> str:
+    return "".join(span["text"] for span in spans)
+
+
+def _image_width(path: Path) -> Optional[int]:
+    try:
+        # Only the header is read
+        with Image.open(path) as img:
+            return img.width
+    except (OSError, ValueError):
+        return None
+
+
+def _html_picture(block: Dict, output_dir: Path) -> str:
+    """<img>, or <picture> with modern formats and a srcset when variants exist"""
+    variants = find_variants(output_dir, block["src"])
+    # Every format is written at the same two sizes, so the JPEG widths apply to all
+    web_width = _image_width(output_dir / variants["web"])
+    print_width = _image_width(output_dir / variants["print"]) if "print" in variants else None
+    responsive = bool(web_width and print_width and print_width > web_width)
+
+    def srcset(web_name: str, print_name: str) -> str:
+        """srcset and sizes attributes for one format"""
+        if not responsive or print_name not in variants:
+            return f'srcset="{html.escape(variants[web_name])}"'
+        candidates = f"{variants[web_name]} {web_width}w, {variants[print_name]} {print_width}w"
+        return f'srcset="{html.escape(candidates)}" sizes="{IMAGE_SIZES}"'
+
+    img = f'<img src="{html.escape(block["src"])}" alt="{html.escape(block["alt"])}"'
+    if responsive:
+        img += f' {srcset("web", "print")}'
+    img += ' loading="lazy" />'
+
+    sources = [
+        f'<source type="{media_type}" {srcset(name, f"print_{name}")} />'
+        for name, (_, media_type) in MODERN_FORMATS.items()
+        if name in variants
+    ]
+    if not sources:
+        return img
+    return "<picture>\n" + "\n".join(sources) + f"\n{img}\n</picture>"
+
+
+def _html_block(block: Dict, output_dir: Path) -> str:
+    kind = block["type"]
+    if kind == "heading":
+        return f"<h{block['level']}>{_html_spans(block['spans'])}</h{block['level']}>"
+    if kind == "paragraph":
+        return f"<p>{_html_spans(block['spans'])}</p>"
+    if kind == "image":
+        figure = f"<figure>\n{_html_picture(block, output_dir)}"
+        if block["caption"]:
+            figure += f"\n<figcaption>{_html_spans(block['caption'])}</figcaption>"
+        return figure + "\n</figure>"
+    if kind == "list":
+        tag = "ol" if block["ordered"] else "ul"
+        items = "\n".join(f"<li>{_html_spans(item)}</li>" for item in block["items"])
+        return f"<{tag}>\n{items}\n</{tag}>"
+    if kind == "quote":
+        return f"<blockquote><p>{_html_spans(block['spans'])}</p></blockquote>"
+    if kind == "code":
+        return f"<pre><code>{html.escape(block['text'])}</code></pre>"
+    if kind == "table":
+        header = "".join(f"<th>{_html_spans(cell)}</th>" for cell in block["header"])
+        rows = "\n".join(
+            "<tr>" + "".join(f"<td>{_html_spans(cell)}</td>" for cell in row) + "</tr>"
+            for row in block["rows"]
         )
-        
-        # Create a styled HTML document
-        html_template = f"""<!DOCTYPE html>
+        return f"<table>\n<thead><tr>{header}</tr></thead>\n<tbody>\n{rows}\n</tbody>\n</table>"
+    if kind == "rule":
+        return "<hr />"
+    return ""
+
+
+@register_format("html", "newsletter.html", "text/html")
+def render_html(document: List[Dict], output_dir: Path) -> bytes:
+    """Styled standalone HTML for Notion/web browsers"""
+
+    html_content = "\n".join(_html_block(block, output_dir) for block in document)
+    title = next(
+        (_plain_text(block["spans"]) for block in document if block["type"] == "heading"),
+        "Newsletter"
+    )
+
+    # Create a styled HTML document
+    html_template = f"""<!DOCTYPE html>
 <html lang="sl">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Newsletter</title>
+    <title>{html.escape(title)}</title>
     <style>
         body {{
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
@@ -63,19 +266,21 @@ class ExportFormatter:
             margin-bottom: 1.2em;
             font-size: 1.05em;
         }}
+        figure {{
+            margin: 20px 0;
+        }}
         img {{
             max-width: 100%;
             height: auto;
             border-radius: 8px;
-            margin: 20px 0;
             box-shadow: 0 4px 12px rgba(0,0,0,0.1);
         }}
-        em {{
-            display: block;
+        figcaption {{
             text-align: center;
             color: #666;
             font-size: 0.9em;
-            margin-top: -10px;
+            font-style: italic;
+            margin-top: 10px;
             margin-bottom: 20px;
         }}
         strong {{
@@ -108,143 +313,128 @@ class ExportFormatter:
             border-radius: 5px;
             overflow-x: auto;
         }}
+        table {{
+            border-collapse: collapse;
+            margin-bottom: 1.2em;
+        }}
+        th, td {{
+            border: 1px solid #ddd;
+            padding: 6px 12px;
+        }}
     </style>
 </head>
 <body>
 {html_content}
 </body>
 </html>"""
-        
-        # Write HTML file
-        html_path = self.output_dir / output_filename
-        html_path.write_text(html_template, encoding='utf-8')
-        
-        return html_path
-    
-    def create_docx(self, markdown_content: str, images_dir: Path, output_filename: str = "newsletter.docx") -> Path:
-        """Convert markdown to DOCX format for Microsoft Word"""
-        
-        doc = Document()
-        
-        # Set document margins
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1)
-            section.right_margin = Inches(1)
-        
-        # Parse markdown content
-        lines = markdown_content.split('\n')
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            if not line:
-                i += 1
+
+    return html_template.encode("utf-8")
+
+
+# Heading font size and colour per level
+DOCX_HEADING_STYLES = {
+    1: (Pt(28), RGBColor(26, 26, 26)),
+    2: (Pt(22), RGBColor(42, 42, 42)),
+    3: (Pt(18), RGBColor(58, 58, 58)),
+}
+DOCX_CAPTION_COLOR = RGBColor(102, 102, 102)
+
+
+def _docx_runs(paragraph, spans: List[Dict], size=None):
+    """Add styled spans to a python-docx paragraph"""
+    for span in spans:
+        lines = span["text"].split("\n")
+        for i, line in enumerate(lines):
+            run = paragraph.add_run(line)
+            run.bold = span["bold"] or None
+            run.italic = span["italic"] or None
+            if span["code"]:
+                run.font.name = "Courier New"
+            if span["href"]:
+                run.underline = True
+            if size:
+                run.font.size = size
+            if i < len(lines) - 1:
+                run.add_break()
+
+
+@register_format(
+    "docx",
+    "newsletter.docx",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+def render_docx(document: List[Dict], output_dir: Path) -> bytes:
+    """DOCX for Microsoft Word"""
+
+    doc = Document()
+
+    # Set document margins
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+
+    for block in document:
+        kind = block["type"]
+
+        if kind == "heading":
+            level = min(block["level"], 9)
+            heading = doc.add_heading("", level=level)
+            heading.alignment = WD_ALIGN_PARAGRAPH.LEFT
+            _docx_runs(heading, block["spans"])
+            size, color = DOCX_HEADING_STYLES.get(level, (None, None))
+            for run in heading.runs:
+                if size:
+                    run.font.size = size
+                    run.font.color.rgb = color
+
+        elif kind == "image":
+            # Print-width variant when there is one (see app.image_variants)
+            variants = find_variants(output_dir, block["src"])
+            image_path = output_dir / variants.get("print", block["src"])
+            if not image_path.exists():
                 continue
-            
-            # Handle headings
-            if line.startswith('# '):
-                # H1 - Title
-                heading = doc.add_heading(line[2:], level=1)
-                heading.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                for run in heading.runs:
-                    run.font.color.rgb = RGBColor(26, 26, 26)
-                    run.font.size = Pt(28)
-            
-            elif line.startswith('## '):
-                # H2 - Section
-                heading = doc.add_heading(line[3:], level=2)
-                for run in heading.runs:
-                    run.font.color.rgb = RGBColor(42, 42, 42)
-                    run.font.size = Pt(22)
-            
-            elif line.startswith('### '):
-                # H3 - Subsection
-                heading = doc.add_heading(line[4:], level=3)
-                for run in heading.runs:
-                    run.font.color.rgb = RGBColor(58, 58, 58)
-                    run.font.size = Pt(18)
-            
-            # Handle images
-            elif line.startswith('!['):
-                # Extract image path and alt text
-                match = re.match(r'!\[(.*?)\]\((.*?)\)', line)
-                if match:
-                    alt_text = match.group(1)
-                    image_path = match.group(2)
-                    
-                    # Construct full image path
-                    full_image_path = self.output_dir / image_path
-                    
-                    if full_image_path.exists():
-                        # Add image to document
-                        doc.add_picture(str(full_image_path), width=Inches(6))
-                        last_paragraph = doc.paragraphs[-1]
-                        last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        
-                        # Add caption if next line is italic (caption)
-                        if i + 1 < len(lines) and lines[i + 1].strip().startswith('*') and lines[i + 1].strip().endswith('*'):
-                            caption_text = lines[i + 1].strip().strip('*')
-                            caption = doc.add_paragraph(caption_text)
-                            caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            for run in caption.runs:
-                                run.font.italic = True
-                                run.font.size = Pt(10)
-                                run.font.color.rgb = RGBColor(102, 102, 102)
-                            i += 1  # Skip caption line
-            
-            # Handle bold text
-            elif '**' in line:
-                paragraph = doc.add_paragraph()
-                parts = re.split(r'(\*\*.*?\*\*)', line)
-                for part in parts:
-                    if part.startswith('**') and part.endswith('**'):
-                        run = paragraph.add_run(part[2:-2])
-                        run.bold = True
-                    elif part:
-                        paragraph.add_run(part)
-            
-            # Handle italic text
-            elif line.startswith('*') and line.endswith('*') and not line.startswith('**'):
-                paragraph = doc.add_paragraph(line.strip('*'))
-                for run in paragraph.runs:
-                    run.italic = True
-                    run.font.color.rgb = RGBColor(102, 102, 102)
-            
-            # Regular paragraph
-            else:
-                # Remove markdown formatting for regular text
-                clean_line = line.replace('**', '')
-                if clean_line:
-                    paragraph = doc.add_paragraph(clean_line)
-                    paragraph.style = 'Normal'
-                    for run in paragraph.runs:
-                        run.font.size = Pt(11)
-            
-            i += 1
-        
-        # Save document
-        docx_path = self.output_dir / output_filename
-        doc.save(str(docx_path))
-        
-        return docx_path
-    
-    def create_all_formats(self, markdown_content: str, images_dir: Path) -> Dict[str, Path]:
-        """Create all export formats"""
-        
-        formats = {}
-        
-        # Markdown (already exists)
-        formats['markdown'] = self.output_dir / "newsletter.md"
-        
-        # HTML for Notion and web
-        formats['html'] = self.create_html(markdown_content, "newsletter.html")
-        
-        # DOCX for Word
-        formats['docx'] = self.create_docx(markdown_content, images_dir, "newsletter.docx")
-        
-        return formats
+            doc.add_picture(str(image_path), width=Inches(6))
+            doc.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            if block["caption"]:
+                caption = doc.add_paragraph()
+                caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                _docx_runs(caption, block["caption"], size=Pt(10))
+                for run in caption.runs:
+                    run.font.italic = True
+                    run.font.color.rgb = DOCX_CAPTION_COLOR
+
+        elif kind == "list":
+            style = "List Number" if block["ordered"] else "List Bullet"
+            for item in block["items"]:
+                _docx_runs(doc.add_paragraph(style=style), item, size=Pt(11))
+
+        elif kind == "quote":
+            _docx_runs(doc.add_paragraph(style="Quote"), block["spans"], size=Pt(11))
+
+        elif kind == "code":
+            paragraph = doc.add_paragraph()
+            _docx_runs(paragraph, [{"text": block["text"], "bold": False, "italic": False, "code": True, "href": None}])
+
+        elif kind == "table":
+            table = doc.add_table(rows=1 + len(block["rows"]), cols=len(block["header"]))
+            table.style = "Table Grid"
+            for row_index, row in enumerate([block["header"]] + block["rows"]):
+                for column, cell in enumerate(row[:len(block["header"])]):
+                    paragraph = table.cell(row_index, column).paragraphs[0]
+                    _docx_runs(paragraph, cell, size=Pt(10))
+                    if row_index == 0:
+                        for run in paragraph.runs:
+                            run.bold = True
+
+        elif kind == "rule":
+            doc.add_paragraph()
+
+        else:
+            paragraph = doc.add_paragraph(style="Normal")
+            _docx_runs(paragraph, block["spans"], size=Pt(11))
 
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,103 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+
+HASH_SIZE = 8  # 8x8 difference hash -> 64 bits
+SHARPNESS_WIDTH = 256
+
+
+def _load_grayscale(path: Path, size: Tuple[int, int]) -> np.ndarray:
+    """Decode a frame as a small grayscale array"""
+    with Image.open(path) as img:
+        # Let the JPEG decoder downscale during decode (DCT scaling)
+        img.draft("L", size)
+        img = img.convert("L").resize(size, Image.Resampling.BILINEAR)
+        return np.asarray(img, dtype=np.float32)
+
+
+def frame_features(paths: List[Path]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute dHash and sharpness for a batch of frames
+
+    Returns:
+        (hashes, sharpness): uint64 difference hashes and Laplacian variance
+        per frame
+    """
+    with Image.open(paths[0]) as first:
+        width, height = first.size
+    sharp_size = (SHARPNESS_WIDTH, max(8, round(SHARPNESS_WIDTH * height / width)))
+
+    gray = np.stack([_load_grayscale(path, sharp_size) for path in paths])
+
+    # dHash: shrink to (HASH_SIZE + 1) x HASH_SIZE and compare horizontal neighbours
+    small = np.stack([
+        np.asarray(
+            Image.fromarray(frame).resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+        )
+        for frame in gray
+    ])
+    bits = small[:, :, 1:] > small[:, :, :-1]
+    hashes = np.packbits(bits.reshape(len(paths), -1), axis=1).view(">u8").ravel()
+
+    # Sharpness: variance of the 4-neighbour Laplacian
+    laplacian = (
+        gray[:, 1:-1, :-2] + gray[:, 1:-1, 2:] + gray[:, :-2, 1:-1] + gray[:, 2:, 1:-1]
+        - 4 * gray[:, 1:-1, 1:-1]
+    )
+    sharpness = laplacian.reshape(len(paths), -1).var(axis=1)
+
+    return hashes.astype(np.uint64), sharpness
+
+
+def hamming_distances(hashes: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances between 64-bit hashes"""
+    xor = hashes[:, None] ^ hashes[None, :]
+    return np.unpackbits(xor.view(np.uint8).reshape(*xor.shape, 8), axis=-1).sum(axis=-1)
+
+
+def dedupe_frames(
+    frames: List[Tuple[float, Path]],
+    threshold: Optional[int] = None
+) -> List[Tuple[float, Path]]:
+    """
+    Collapse near-duplicate frames before vision analysis
+
+    Consecutive frames within `threshold` bits of the first frame of their
+    run are grouped, and the sharpest frame of each run is kept. Runs that
+    repeat an earlier kept frame (e.g. returning to a previous slide) are
+    dropped as well.
+
+    Args:
+        frames: (timestamp, path) pairs in time order
+        threshold: Max Hamming distance between dHashes (FRAME_DEDUP_THRESHOLD)
+
+    Returns:
+        The distinct (timestamp, path) pairs, still in time order
+    """
+    if threshold is None:
+        threshold = int(os.getenv("FRAME_DEDUP_THRESHOLD", 6))
+    if len(frames) < 2:
+        return list(frames)
+
+    hashes, sharpness = frame_features([path for _, path in frames])
+    distances = hamming_distances(hashes)
+
+    # Group runs against the run's first frame, keeping the sharpest of each
+    kept = []
+    run_start = 0
+    for i in range(1, len(frames) + 1):
+        if i == len(frames) or distances[run_start, i] > threshold:
+            run = np.arange(run_start, i)
+            kept.append(int(run[np.argmax(sharpness[run])]))
+            run_start = i
+
+    # Drop runs that repeat an earlier kept frame
+    distinct = []
+    for index in kept:
+        if not distinct or distances[index, distinct].min() > threshold:
+            distinct.append(index)
+
+    return [frames[i] for i in distinct]
@@ -0,0 +1,93 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+# Entries still needed by a job in this process, which prune() skips
+_pins: Counter = Counter()
+_pins_lock = threading.Lock()
+
+
+class ImagePayloadCache:
+    """
+    On-disk cache of images already prepared for the vision model
+
+    Entries are keyed by the SHA-256 of the source frame plus the target
+    size and quality, so retries and re-runs of the same video skip the
+    decode/resize/re-encode work entirely.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or Path(os.getenv("IMAGE_CACHE_DIR", "cache/images"))
+        self.max_bytes = max_bytes or int(os.getenv("IMAGE_CACHE_MAX_MB", 512)) * 1024 * 1024
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(image_path: Path, max_dimension: int, quality: int) -> str:
+        digest = hashlib.sha256()
+        with open(image_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return f"{digest.hexdigest()}_{max_dimension}_q{quality}"
+
+    def path_for(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        # Bump mtime so pruning evicts least recently used entries first
+        path.touch()
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file;
+        # the temporary name is unique per writer, not just per process
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, path)
+        return path
+
+    def pin(self, paths: Iterable[Path]):
+        """Keep entries from being pruned until unpin() (calls nest)"""
+        with _pins_lock:
+            _pins.update(paths)
+
+    def unpin(self, paths: Iterable[Path]):
+        with _pins_lock:
+            _pins.subtract(paths)
+            for path in [path for path, count in _pins.items() if count <= 0]:
+                del _pins[path]
+
+    def prune(self):
+        """Delete least recently used entries until the cache fits in max_bytes
+
+        Pinned entries are kept even if that leaves the cache over budget.
+        """
+        with _pins_lock:
+            pinned = set(_pins)
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*/*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in pinned:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,177 @@
+"""
+Output image variants for the newsletter
+
+Each key frame is written to images/ in the sizes its consumers need
+instead of as the raw extracted frame:
+
+    frame_N.jpg        web width, referenced from the markdown and HTML
+    frame_N.print.jpg  print width, embedded in DOCX and offered to HTML
+                       through srcset for high-density screens
+    frame_N.webp/.avif web width in modern formats (IMAGE_MODERN_FORMATS),
+                       offered to HTML through <picture>
+    frame_N.print.webp/.avif
+                       print width in the same formats, so the <picture>
+                       sources get the same srcset as the JPEG
+
+Variants are never upscaled, so for small frames several of them have
+the same bytes; those are hard-linked to the first copy.
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from PIL import Image, features
+
+
+_variant_pool: Optional[ThreadPoolExecutor] = None
+
+# Variant suffixes, in <picture> source order
+MODERN_FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+
+def image_settings() -> Dict:
+    """Output image settings from the environment"""
+    requested = [
+        name.strip().lower()
+        for name in os.getenv("IMAGE_MODERN_FORMATS", "webp").split(",")
+        if name.strip()
+    ]
+    modern = []
+    for name in MODERN_FORMATS:
+        if name not in requested:
+            continue
+        if features.check(name):
+            modern.append(name)
+        else:
+            print(f"Pillow has no {name.upper()} support, skipping {name} image variants")
+    return {
+        "web_width": int(os.getenv("IMAGE_WEB_WIDTH", 1200)),
+        "print_width": int(os.getenv("IMAGE_PRINT_WIDTH", 1600)),
+        "jpeg_quality": int(os.getenv("IMAGE_JPEG_QUALITY", 82)),
+        "modern_quality": int(os.getenv("IMAGE_MODERN_QUALITY", 70)),
+        "modern_formats": modern,
+    }
+
+
+def _get_variant_pool() -> ThreadPoolExecutor:
+    """Bounded pool for variant encoding (PIL releases the GIL while resizing and encoding)"""
+    global _variant_pool
+    if _variant_pool is None:
+        _variant_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("IMAGE_OUTPUT_WORKERS", 4)),
+            thread_name_prefix="image-variants"
+        )
+    return _variant_pool
+
+
+def _resized(img: Image.Image, width: int) -> Image.Image:
+    if img.width <= width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(img: Image.Image, format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if format == "JPEG":
+        img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buffer, format=format, quality=quality)
+    return buffer.getvalue()
+
+
+def _write(path: Path, data: bytes, written: Dict[str, Path]):
+    """Write a variant, hard-linking it to an earlier one with the same bytes"""
+    digest = hashlib.sha256(data).hexdigest()
+    path.unlink(missing_ok=True)
+    existing = written.get(digest)
+    if existing is not None:
+        try:
+            os.link(existing, path)
+            return
+        except OSError:
+            pass  # No hard links on this filesystem
+    path.write_bytes(data)
+    written[digest] = path
+
+
+def write_variants(source: Path, images_dir: Path, stem: str, settings: Dict) -> Dict[str, str]:
+    """
+    Write the output variants of one frame
+
+    Args:
+        source: Extracted frame
+        images_dir: Job's images directory
+        stem: Base name of the variants (e.g. "frame_1")
+        settings: image_settings()
+
+    Returns:
+        File name per variant: "web", "print", and for each modern format
+        its name (web width) and "print_" plus its name
+    """
+    with Image.open(source) as img:
+        # Let the JPEG decoder downscale during decode (DCT scaling)
+        img.draft("RGB", (settings["print_width"], settings["print_width"]))
+        img = img.convert("RGB")
+        print_img = _resized(img, settings["print_width"])
+        web_img = _resized(print_img, settings["web_width"])
+
+    names = {"web": f"{stem}.jpg", "print": f"{stem}.print.jpg"}
+    written: Dict[str, Path] = {}
+    web_bytes = _encode(web_img, "JPEG", settings["jpeg_quality"])
+    _write(images_dir / names["web"], web_bytes, written)
+    # Frames no wider than the web width get the same print bytes
+    print_bytes = web_bytes if print_img is web_img else _encode(print_img, "JPEG", settings["jpeg_quality"])
+    _write(images_dir / names["print"], print_bytes, written)
+
+    for name in settings["modern_formats"]:
+        format, _ = MODERN_FORMATS[name]
+        names[name] = f"{stem}.{name}"
+        web_bytes = _encode(web_img, format, settings["modern_quality"])
+        _write(images_dir / names[name], web_bytes, written)
+        names[f"print_{name}"] = f"{stem}.print.{name}"
+        print_bytes = web_bytes if print_img is web_img else _encode(print_img, format, settings["modern_quality"])
+        _write(images_dir / names[f"print_{name}"], print_bytes, written)
+    return names
+
+
+async def write_all_variants(sources: List[Path], images_dir: Path) -> List[Dict[str, str]]:
+    """Write the variants of every frame in parallel (frame_1, frame_2, ...)"""
+    settings = image_settings()
+    loop = asyncio.get_running_loop()
+    pool = _get_variant_pool()
+    return await asyncio.gather(*[
+        loop.run_in_executor(pool, write_variants, Path(source), images_dir, f"frame_{i + 1}", settings)
+        for i, source in enumerate(sources)
+    ])
+
+
+def find_variants(output_dir: Path, src: str) -> Dict[str, str]:
+    """
+    Variants that exist next to an image referenced from the markdown
+
+    Args:
+        output_dir: Job's output directory
+        src: Image path relative to it (the web variant, e.g. images/frame_1.jpg)
+
+    Returns:
+        Relative path per variant name (as in write_variants()), always
+        including "web"
+    """
+    web = Path(src)
+    variants = {"web": src}
+    candidates = {"print": web.with_name(f"{web.stem}.print{web.suffix}")}
+    for name in MODERN_FORMATS:
+        candidates[name] = web.with_suffix(f".{name}")
+        candidates[f"print_{name}"] = web.with_name(f"{web.stem}.print.{name}")
+    for name, path in candidates.items():
+        if (output_dir / path).exists():
+            variants[name] = path.as_posix()
+    return variants
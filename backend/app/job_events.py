@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.job_store import JobStore
+
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Fields that change on every update and carry nothing for the client
+_VOLATILE_FIELDS = ("updated_at",)
+
+
+class JobEventHub:
+    """
+    Wakes event streams when a job changes
+
+    The job store calls notify() (via on_change) after every write made in
+    this process. Writes from other worker processes aren't seen here, so
+    streams also re-read the store on a timeout.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Event]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Remember the event loop so notify() can be called from worker threads"""
+        self._loop = loop
+
+    def subscribe(self, job_ids: List[str]) -> asyncio.Event:
+        event = asyncio.Event()
+        for job_id in job_ids:
+            self._subscribers.setdefault(job_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, job_ids: List[str], event: asyncio.Event):
+        for job_id in job_ids:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(event)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def notify(self, job_id: str):
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._wake(job_id)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake, job_id)
+
+    def _wake(self, job_id: str):
+        for event in self._subscribers.get(job_id, ()):
+            event.set()
+
+
+def format_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    """Serialise one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_event_id(event_id: Optional[str]) -> Dict[str, int]:
+    """Parse a `job_id:version,...` event ID back into versions per job"""
+    versions = {}
+    for part in (event_id or "").split(","):
+        job_id, _, version = part.strip().rpartition(":")
+        if job_id and version.isdigit():
+            versions[job_id] = int(version)
+    return versions
+
+
+async def job_event_stream(
+    job_store: JobStore,
+    hub: JobEventHub,
+    job_ids: List[str],
+    last_event_id: Optional[str] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    heartbeat_seconds: Optional[float] = None,
+    poll_seconds: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Server-sent events for one or more jobs
+
+    Each job starts with a `snapshot` event carrying its full state, then
+    only the fields that changed: `stage` when the status changes,
+    `progress` otherwise. A job that is deleted gets a `deleted` event, and
+    an `end` event follows once every job has finished. Event IDs list the
+    version of every job on the stream, so a client reconnecting with
+    Last-Event-ID only gets a new snapshot for jobs that changed while it
+    was away.
+
+    Args:
+        job_store: Store to read job state from
+        hub: Change notifications for this process
+        job_ids: Jobs to watch
+        last_event_id: Last-Event-ID header from a reconnecting client
+        is_disconnected: Coroutine function telling whether the client left
+        heartbeat_seconds: Idle time before a keep-alive comment (SSE_HEARTBEAT_SECONDS)
+        poll_seconds: Max time between store re-reads (SSE_POLL_SECONDS)
+    """
+    if heartbeat_seconds is None:
+        heartbeat_seconds = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+    if poll_seconds is None:
+        poll_seconds = float(os.getenv("SSE_POLL_SECONDS", 5))
+
+    seen_versions = parse_event_id(last_event_id)
+    versions = {job_id: seen_versions.get(job_id, 0) for job_id in job_ids}
+    sent: Dict[str, dict] = {}
+    active = list(job_ids)
+
+    # Reconnect delay for the browser's EventSource
+    yield f"retry: {int(poll_seconds * 1000)}\n\n"
+    last_write = time.monotonic()
+
+    changed = hub.subscribe(job_ids)
+    try:
+        while active:
+            # Clear before reading so a write during the read still wakes us
+            changed.clear()
+
+            for job_id in list(active):
+                job = await job_store.get_async(job_id)
+                if job is None:
+                    active.remove(job_id)
+                    versions.pop(job_id, None)
+                    yield format_event("deleted", {"job_id": job_id}, _event_id(versions))
+                    last_write = time.monotonic()
+                    continue
+
+                if job["version"] != versions[job_id] or job_id not in sent:
+                    event, data = _diff(sent.get(job_id), job, versions[job_id])
+                    versions[job_id] = job["version"]
+                    sent[job_id] = job
+                    if event is not None:
+                        yield format_event(event, data, _event_id(versions))
+                        last_write = time.monotonic()
+
+                if job.get("status") in TERMINAL_STATUSES:
+                    active.remove(job_id)
+
+            if not active:
+                break
+
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            if is_disconnected is not None and await is_disconnected():
+                return
+
+            if time.monotonic() - last_write >= heartbeat_seconds:
+                yield ": heartbeat\n\n"
+                last_write = time.monotonic()
+
+        # Tell the client to close rather than let EventSource reconnect
+        yield format_event("end", {"job_ids": job_ids}, _event_id(versions))
+    finally:
+        hub.unsubscribe(job_ids, changed)
+
+
+def _event_id(versions: Dict[str, int]) -> str:
+    return ",".join(f"{job_id}:{version}" for job_id, version in versions.items())
+
+
+def _diff(previous: Optional[dict], job: dict, client_version: int):
+    """Event name and payload taking the client from `previous` to `job`"""
+    if previous is None:
+        if client_version == job["version"]:
+            # Resumed and the client already has this state
+            return None, None
+        return "snapshot", _public(job)
+
+    delta = {
+        key: value for key, value in job.items()
+        if key not in _VOLATILE_FIELDS and key != "version" and previous.get(key) != value
+    }
+    if not delta:
+        return None, None
+    delta["job_id"] = job["job_id"]
+    delta["version"] = job["version"]
+    event = "stage" if "status" in delta else "progress"
+    return event, delta
+
+
+def _public(job: dict) -> dict:
+    return {key: value for key, value in job.items() if key not in _VOLATILE_FIELDS}
@@ -0,0 +1,200 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def transcribe_workers() -> int:
+    """
+    Number of transcription worker processes
+
+    TRANSCRIBE_WORKERS if set, otherwise one worker per four CPU cores (at
+    most four): Whisper on CPU gains little beyond a few torch threads, so
+    several workers with a share of the cores each beat one using them
+    all. A GPU is shared by a single worker.
+    """
+    configured = int(os.getenv("TRANSCRIBE_WORKERS") or 0)
+    if configured > 0:
+        return configured
+    if (os.getenv("WHISPER_DEVICE") or "cpu").startswith("cuda"):
+        return 1
+    return max(1, min(4, (os.cpu_count() or 1) // 4))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+    def __init__(self, queue_depth: int):
+        super().__init__(f"Job queue is full ({queue_depth} jobs waiting)")
+        self.queue_depth = queue_depth
+
+
+class JobScheduler:
+    """
+    Bounded job queue with per-stage concurrency limits
+
+    At most `max_active_jobs` jobs run at once and at most `max_queued_jobs`
+    wait behind them. Inside a job, each pipeline stage (download, ffmpeg,
+    transcribe, llm) is gated by its own semaphore, and transcription runs
+    in a dedicated process pool since it is CPU-bound.
+    """
+
+    STAGES = ("download", "ffmpeg", "transcribe", "llm")
+
+    def __init__(self):
+        self.max_active_jobs = int(os.getenv("MAX_ACTIVE_JOBS", 4))
+        self.max_queued_jobs = int(os.getenv("MAX_QUEUED_JOBS", 50))
+        self.stage_limits = {
+            "download": int(os.getenv("DOWNLOAD_CONCURRENCY", 2)),
+            "ffmpeg": int(os.getenv("FFMPEG_CONCURRENCY", 2)),
+            "transcribe": transcribe_workers(),
+            "llm": int(os.getenv("LLM_CONCURRENCY", 4)),
+        }
+
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+        self.on_start: Optional[Callable[[str, float], None]] = None
+
+        self._queue: Optional[asyncio.Queue] = None
+        # job_id -> enqueue time, in queue order
+        self._pending: "OrderedDict[str, float]" = OrderedDict()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stage_waiting = {stage: 0 for stage in self.STAGES}
+        self._stage_active = {stage: 0 for stage in self.STAGES}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self, warm_up: Optional[Callable] = None):
+        """Start worker tasks and the transcription process pool"""
+        self._queue = asyncio.Queue()
+        self._semaphores = {
+            stage: asyncio.Semaphore(limit)
+            for stage, limit in self.stage_limits.items()
+        }
+
+        # Spawn instead of fork: forking a process that has torch/ffmpeg
+        # threads running can deadlock the child
+        self.process_pool = ProcessPoolExecutor(
+            max_workers=self.stage_limits["transcribe"],
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.max_active_jobs)
+        ]
+
+        if warm_up:
+            # One call per worker so every process is started and warm
+            loop = asyncio.get_event_loop()
+            return await asyncio.gather(*[
+                loop.run_in_executor(self.process_pool, warm_up)
+                for _ in range(self.stage_limits["transcribe"])
+            ])
+
+    async def shutdown(self):
+        """Stop workers and the process pool"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        if self.process_pool:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def is_full(self) -> bool:
+        return self.queue_depth >= self.max_queued_jobs
+
+    def submit(self, job_id: str, func: Callable[..., Awaitable], *args) -> int:
+        """
+        Queue a job coroutine function for execution
+
+        Returns:
+            1-based position of the job in the queue
+
+        Raises:
+            QueueFullError: If `max_queued_jobs` jobs are already waiting
+        """
+        if self.is_full():
+            raise QueueFullError(self.queue_depth)
+
+        self._pending[job_id] = time.monotonic()
+        self._queue.put_nowait((job_id, func, args))
+        return self.queue_depth
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that hasn't started yet"""
+        return self._pending.pop(job_id, None) is not None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based queue position, or None if the job isn't waiting"""
+        for position, pending_id in enumerate(self._pending, start=1):
+            if pending_id == job_id:
+                return position
+        return None
+
+    def queue_wait(self, job_id: str) -> Optional[float]:
+        """Seconds a still-queued job has been waiting"""
+        enqueued_at = self._pending.get(job_id)
+        if enqueued_at is None:
+            return None
+        return time.monotonic() - enqueued_at
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Hold one slot of a stage's concurrency limit; yields the seconds spent waiting for it"""
+        semaphore = self._semaphores[name]
+        started = time.perf_counter()
+        self._stage_waiting[name] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._stage_waiting[name] -= 1
+
+        self._stage_active[name] += 1
+        try:
+            yield time.perf_counter() - started
+        finally:
+            self._stage_active[name] -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        """Snapshot of queue and stage utilisation"""
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queued_jobs": self.max_queued_jobs,
+            "max_active_jobs": self.max_active_jobs,
+            "stages": {
+                stage: {
+                    "limit": self.stage_limits[stage],
+                    "active": self._stage_active[stage],
+                    "waiting": self._stage_waiting[stage],
+                }
+                for stage in self.STAGES
+            },
+        }
+
+    async def _worker(self):
+        while True:
+            job_id, func, args = await self._queue.get()
+            try:
+                enqueued_at = self._pending.pop(job_id, None)
+                if enqueued_at is None:
+                    # Cancelled while waiting
+                    continue
+
+                if self.on_start:
+                    self.on_start(job_id, time.monotonic() - enqueued_at)
+
+                await func(*args)
+            except Exception as e:
+                print(f"Unhandled error in scheduled job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import functools
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class JobStore(ABC):
+    """
+    Storage for job state
+
+    Jobs are plain dicts. Every update is an atomic merge of the given
+    fields that also bumps `version` and `updated_at`, so readers in any
+    worker process see either the old or the new state, never a mix.
+    `on_change(job_id)` is called after every create, update and delete
+    made through this instance.
+
+    Async code uses the *_async() methods. For stores that do blocking I/O
+    (`blocking_io`) they run reads in a worker thread and writes in a
+    single writer thread, so writes from this process apply in the order
+    they were made; update_nowait() queues a write from synchronous code
+    on the event loop without waiting for it.
+    """
+
+    # Whether calls block on I/O and so must not run on the event loop
+    blocking_io = False
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("JOB_TTL_SECONDS", 7 * 24 * 3600))
+        self.on_change: Optional[Callable[[str], None]] = None
+        self._write_pool: Optional[ThreadPoolExecutor] = None
+
+    @abstractmethod
+    def create(self, job_id: str, **fields) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        """Merge fields into a job; returns the new state or None if it doesn't exist"""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Most recently created jobs first, optionally filtered by status"""
+
+    @abstractmethod
+    def expire(self) -> List[str]:
+        """Delete jobs not updated within the TTL; returns their IDs"""
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def _get_write_pool(self) -> ThreadPoolExecutor:
+        if self._write_pool is None:
+            self._write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        return self._write_pool
+
+    async def _read(self, func: Callable, *args, **kwargs):
+        if not self.blocking_io:
+            return func(*args, **kwargs)
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def _write(self, func: Callable, *args, **kwargs):
+        if not self.blocking_io:
+            return func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_write_pool(), functools.partial(func, *args, **kwargs))
+
+    async def create_async(self, job_id: str, **fields) -> dict:
+        return await self._write(self.create, job_id, **fields)
+
+    async def get_async(self, job_id: str) -> Optional[dict]:
+        return await self._read(self.get, job_id)
+
+    async def update_async(self, job_id: str, **fields) -> Optional[dict]:
+        return await self._write(self.update, job_id, **fields)
+
+    async def delete_async(self, job_id: str) -> bool:
+        return await self._write(self.delete, job_id)
+
+    async def expire_async(self) -> List[str]:
+        return await self._write(self.expire)
+
+    def update_nowait(self, job_id: str, **fields):
+        """Queue an update without waiting for it (for callbacks on the event loop)"""
+        if not self.blocking_io:
+            self.update(job_id, **fields)
+            return
+        future = self._get_write_pool().submit(self.update, job_id, **fields)
+        future.add_done_callback(functools.partial(self._log_write_error, job_id))
+
+    @staticmethod
+    def _log_write_error(job_id: str, future: Future):
+        if future.exception() is not None:
+            print(f"Error updating job {job_id}: {future.exception()}")
+
+    def _changed(self, job_id: str):
+        if self.on_change is not None:
+            self.on_change(job_id)
+
+    @staticmethod
+    def _new_job(job_id: str, fields: dict) -> dict:
+        now = time.time()
+        return {
+            **fields,
+            "job_id": job_id,
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        }
+
+
+class InMemoryJobStore(JobStore):
+    """Job store for a single process"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        super().__init__(ttl_seconds)
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, **fields) -> dict:
+        job = self._new_job(job_id, fields)
+        with self._lock:
+            self._jobs[job_id] = job
+            job = dict(job)
+        self._changed(job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            job = dict(job)
+        self._changed(job_id)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            deleted = self._jobs.pop(job_id, None) is not None
+        if deleted:
+            self._changed(job_id)
+        return deleted
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[dict]:
+        with self._lock:
+            jobs = [
+                dict(job) for job in self._jobs.values()
+                if status is None or job.get("status") == status
+            ]
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        return jobs[:limit]
+
+    def expire(self) -> List[str]:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job["updated_at"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return expired
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store shared by every worker process on the host
+
+    Uses WAL mode so status reads never block behind a writer. Status,
+    progress and timestamps are real columns (indexed for lookups by
+    status and creation time); the rest of the job is a JSON document.
+    Writes can wait up to the 10 s busy timeout for another process, so
+    async callers use the *_async() methods.
+    """
+
+    blocking_io = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT,
+            progress INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            version INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+        CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at);
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, ttl_seconds: Optional[int] = None):
+        super().__init__(ttl_seconds)
+        self.db_path = Path(db_path or os.getenv("JOB_DB_PATH", "jobs.db"))
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        data, version, created_at, updated_at = row
+        job = json.loads(data)
+        job.update(version=version, created_at=created_at, updated_at=updated_at)
+        return job
+
+    def create(self, job_id: str, **fields) -> dict:
+        job = self._new_job(job_id, fields)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs "
+            "(job_id, status, progress, created_at, updated_at, version, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id, job.get("status"), job.get("progress"),
+                job["created_at"], job["updated_at"], job["version"],
+                json.dumps(job, ensure_ascii=False),
+            ),
+        )
+        self._changed(job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(
+            "SELECT data, version, created_at, updated_at FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so the read-merge-write
+        # can't interleave with another process updating the same job
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data, version, created_at, updated_at FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+
+            job = self._row_to_job(row)
+            job.update(fields)
+            job["updated_at"] = time.time()
+            job["version"] += 1
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, updated_at = ?, version = ?, data = ? "
+                "WHERE job_id = ?",
+                (
+                    job.get("status"), job.get("progress"), job["updated_at"],
+                    job["version"], json.dumps(job, ensure_ascii=False), job_id,
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._changed(job_id)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        cursor = self._conn().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        if cursor.rowcount > 0:
+            self._changed(job_id)
+            return True
+        return False
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[dict]:
+        if status is None:
+            rows = self._conn().execute(
+                "SELECT data, version, created_at, updated_at FROM jobs "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT data, version, created_at, updated_at FROM jobs "
+                "WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                (status, limit),
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def expire(self) -> List[str]:
+        cutoff = time.time() - self.ttl_seconds
+        conn = self._conn()
+        rows = conn.execute("SELECT job_id FROM jobs WHERE updated_at < ?", (cutoff,)).fetchall()
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+        return [job_id for (job_id,) in rows]
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by JOB_STORE (memory or sqlite)"""
+    backend = os.getenv("JOB_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    if backend == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown JOB_STORE backend: {backend}")
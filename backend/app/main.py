@@ -1,20 +1,41 @@
 import os
+import time
 import uuid
 import shutil
 from pathlib import Path
-from typing import Dict, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import asyncio
 
-from app.video_processor import VideoProcessor
-from app.ai_service import AIService
+from app.video_processor import VideoProcessor, frame_settings
+from app.ai_service import AIService, article_settings
 from app.newsletter_generator import NewsletterGenerator
-from app.youtube_downloader import YouTubeDownloader
+from app.proofreader import proofread_settings
+from app.youtube_downloader import CAPTION_LANGUAGES, YouTubeDownloader
+from app.whisper_registry import whisper_registry, warm_up_worker
+from app.transcription import transcription_settings
+from app.transcript import Transcript
+from app.frame_dedup import dedupe_frames
+from app.artifact_cache import ArtifactCache
+from app.job_scheduler import JobScheduler, QueueFullError
+from app.job_store import create_job_store
+from app.job_events import JobEventHub, job_event_stream
+from app.stage_timer import StageTimer
+from app.archive import ArchiveStore
+from app.export_formatter import ExportFormatter, FORMATS
+from app.file_responses import file_response
+from app.metrics import metrics
+from app.upload_stream import (
+    MULTIPART_OVERHEAD,
+    InvalidUploadError,
+    StreamingVideoUpload,
+    UploadTooLargeError,
+)
 
 load_dotenv()
 
@@ -33,6 +54,12 @@ app.add_middleware(
 UPLOAD_DIR = Path("uploads")
 OUTPUT_DIR = Path("output")
 MAX_VIDEO_SIZE = int(os.getenv("MAX_VIDEO_SIZE", 524288000))  # 500MB default
+MAX_STREAM_JOBS = 50  # jobs per /api/events connection
+PARTIAL_ARTICLE_NAME = "article.partial.md"  # draft served by /api/preview while writing
+PARTIAL_UPDATE_SECONDS = 0.5
+EXPECTED_ARTICLE_CHARS = 8000  # ~1000 Slovenian words, for the progress estimate
+# Share of the audio that must be transcribed before key frame selection starts
+SELECTION_MIN_COVERAGE = float(os.getenv("SELECTION_MIN_COVERAGE", 0.8))
 
 # Create directories
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -41,8 +68,129 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Mount static files for serving images
 app.mount("/output", StaticFiles(directory="output"), name="output")
 
-# Job storage (in production, use a database)
-jobs: Dict[str, dict] = {}
+# Job state, shared across worker processes when JOB_STORE=sqlite
+job_store = create_job_store()
+
+# Pushes job changes to open event streams
+job_events = JobEventHub()
+job_store.on_change = job_events.notify
+
+# Bounded job queue with per-stage worker limits
+scheduler = JobScheduler()
+
+# Stage outputs reused across jobs for the same video
+artifact_cache = ArtifactCache()
+
+# Download zips of finished jobs
+archives = ArchiveStore(OUTPUT_DIR)
+
+
+def _record_queue_wait(job_id: str, wait_seconds: float):
+    job_store.update_nowait(job_id, queue_wait_seconds=round(wait_seconds, 3))
+
+
+scheduler.on_start = _record_queue_wait
+
+
+def _delete_job_files(job_id: str):
+    """Remove a job's output directory, zip and any leftover upload"""
+    output_dir = OUTPUT_DIR / job_id
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    
+    archives.discard(job_id)
+    
+    # The upload itself plus any frame directories extracted next to it
+    for leftover in UPLOAD_DIR.glob(f"{job_id}_*"):
+        if leftover.is_dir():
+            shutil.rmtree(leftover, ignore_errors=True)
+        else:
+            leftover.unlink(missing_ok=True)
+
+
+async def _expire_jobs_loop():
+    """Periodically drop jobs older than JOB_TTL_SECONDS along with their files"""
+    interval = min(job_store.ttl_seconds, 3600)
+    while True:
+        try:
+            for job_id in await job_store.expire_async():
+                _delete_job_files(job_id)
+        except Exception as e:
+            print(f"Error expiring jobs: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _run_together(*coros):
+    """Run coroutines concurrently; if one fails, cancel the others and re-raise"""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _partial_article_writer(job_id: str, output_dir: Path) -> Callable[[str], None]:
+    """
+    Callback publishing the article draft while it streams in
+
+    The draft is written to PARTIAL_ARTICLE_NAME for /api/preview (atomically,
+    so a preview never sees a half-written file) and the job's progress is
+    moved through 75-90 by its length. Updates are throttled to one per
+    PARTIAL_UPDATE_SECONDS.
+    """
+    partial_path = output_dir / PARTIAL_ARTICLE_NAME
+    last_update = 0.0
+
+    def on_partial(draft: str):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < PARTIAL_UPDATE_SECONDS:
+            return
+        last_update = now
+
+        tmp_path = partial_path.with_suffix(".tmp")
+        tmp_path.write_text(draft, encoding="utf-8")
+        os.replace(tmp_path, partial_path)
+        job_store.update_nowait(
+            job_id,
+            progress=min(90, 75 + 15 * len(draft) // EXPECTED_ARTICLE_CHARS),
+            message="Writing Slovenian article...",
+            article_chars=len(draft)
+        )
+
+    return on_partial
+
+
+def _report_download_progress(job_id: str, progress: Dict):
+    """Move a downloading job through 5-10% by bytes downloaded (called from the download thread)"""
+    downloaded_mb = progress["downloaded_bytes"] / (1024 * 1024)
+    if progress["total_bytes"]:
+        fraction = min(1.0, progress["downloaded_bytes"] / progress["total_bytes"])
+        message = f"Downloading video from YouTube... {downloaded_mb:.1f} / {progress['total_bytes'] / (1024 * 1024):.1f} MB"
+    else:
+        fraction = 0.0
+        message = f"Downloading video from YouTube... {downloaded_mb:.1f} MB"
+    job_store.update(job_id, progress=5 + int(5 * fraction), message=message, download=progress)
+
+
+def _queue_full_response(error: QueueFullError) -> JSONResponse:
+    """429 response telling the client where it would have been queued"""
+    return JSONResponse(
+        status_code=429,
+        content={
+            "detail": "Too many videos are being processed, please retry later",
+            "queue_depth": error.queue_depth,
+            "queue_position": error.queue_depth + 1,
+        },
+        headers={"Retry-After": "30"},
+    )
+
+
+# Bump when the cached transcript format changes (2: timestamped segments)
+TRANSCRIPT_FORMAT_VERSION = 2
 
 
 class JobStatus(BaseModel):
@@ -58,119 +206,412 @@ class YouTubeUpload(BaseModel):
     url: str
 
 
-async def process_video_task(job_id: str, video_path: Path):
-    """Background task to process video"""
+def _artifact_keys(
+    source_key: Optional[str],
+    transcript_source: Optional[str] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Artifact cache key per pipeline stage
+    
+    Keys are chained (frames include the transcript key, the article both),
+    so a stage is only reused when everything it was derived from is too.
+    
+    Args:
+        source_key: Content identity of the video
+        transcript_source: Where a transcript that didn't come from Whisper
+            came from (e.g. "captions:en:manual")
+    """
+    if not source_key:
+        return {stage: None for stage in ArtifactCache.STAGES}
+    
+    if transcript_source:
+        transcript_key = ArtifactCache.make_key(
+            "transcript", TRANSCRIPT_FORMAT_VERSION, source_key, transcript_source
+        )
+    else:
+        transcript_key = ArtifactCache.make_key(
+            "transcript", TRANSCRIPT_FORMAT_VERSION, source_key,
+            whisper_registry.model_name, transcription_settings()
+        )
+    frames_key = ArtifactCache.make_key(
+        "frames", source_key, transcript_key, frame_settings(), SELECTION_MIN_COVERAGE, AIService.model
+    )
+    article_key = ArtifactCache.make_key(
+        "article", transcript_key, frames_key, article_settings(), proofread_settings(), AIService.model
+    )
+    return {"transcript": transcript_key, "frames": frames_key, "article": article_key}
+
+
+def _caption_source(language: str, automatic: bool) -> str:
+    """transcript_source of a job transcribed from YouTube captions"""
+    return f"captions:{language}:{'auto' if automatic else 'manual'}"
+
+
+def _fully_cached_source(source_key: str, captions_policy: str) -> Tuple[bool, Optional[str]]:
+    """
+    Transcript source of an earlier job whose stages are all cached
+
+    The keys depend on where the transcript came from, which for a YouTube
+    video is only known after downloading it; so every source the
+    captions policy allows is tried, in the order the downloader prefers
+    them, before Whisper.
+    
+    Returns:
+        (found, transcript_source), transcript_source being None for Whisper
+    """
+    sources: List[Optional[str]] = []
+    if captions_policy != "off":
+        kinds = (False, True) if captions_policy == "auto" else (False,)
+        sources += [_caption_source(language, automatic) for automatic in kinds for language in CAPTION_LANGUAGES]
+    sources.append(None)
+    for transcript_source in sources:
+        keys = _artifact_keys(source_key, transcript_source)
+        if all(artifact_cache.contains(stage, key) for stage, key in keys.items()):
+            return True, transcript_source
+    return False, None
+
+
+def _cached_key_frames(entry: dict) -> List[dict]:
+    """Rebuild key frame dicts from a cached frames entry"""
+    return [
+        {**frame, "path": entry["files"][f"frame_{i}"]}
+        for i, frame in enumerate(entry["key_frames"])
+    ]
+
+
+async def process_video_task(
+    job_id: str,
+    video_path: Optional[Path],
+    source_key: Optional[str] = None,
+    transcript: Optional[Transcript] = None,
+    transcript_source: Optional[str] = None
+):
+    """Background task to process video
+    
+    Args:
+        job_id: Job to update
+        video_path: Uploaded/downloaded video; may be None only when every
+            stage is already in the artifact cache
+        source_key: Content identity of the video (upload hash or YouTube
+            ID) used for artifact cache lookups
+        transcript: Transcript from elsewhere (e.g. YouTube captions); audio
+            extraction and Whisper are skipped
+        transcript_source: Where `transcript` came from
+    """
+    # Stages and Claude calls of this job, exposed as its "timeline"
+    timer = StageTimer()
     try:
         # Update status
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["progress"] = 10
-        jobs[job_id]["message"] = "Extracting audio and frames..."
+        await job_store.update_async(
+            job_id, status="processing", progress=10, message="Extracting audio and frames..."
+        )
         
         # Initialize processors
-        video_processor = VideoProcessor(video_path)
-        ai_service = AIService()
+        ai_service = AIService(timer=timer)
         newsletter_gen = NewsletterGenerator()
         
-        # Step 1: Extract audio and frames
-        audio_path = await video_processor.extract_audio()
-        jobs[job_id]["progress"] = 20
-        jobs[job_id]["message"] = "Audio extracted, extracting frames..."
+        # Reuse whatever stages a previous job already produced
+        keys = _artifact_keys(source_key, transcript_source)
+        # Cached files are linked into the job's own directory so eviction
+        # by another job's put() can't pull them away mid-job
+        cached_files_dir = UPLOAD_DIR / f"{job_id}_cached_frames"
+        cached = {
+            stage: await artifact_cache.get_async(stage, key, files_dir=cached_files_dir)
+            for stage, key in keys.items()
+        }
+        await job_store.update_async(
+            job_id,
+            cache={
+                stage: ("hit" if cached[stage] else "miss") if keys[stage] else "off"
+                for stage in keys
+            },
+            transcript_source=transcript_source or "whisper"
+        )
+        if transcript is not None:
+            await artifact_cache.put_async("transcript", keys["transcript"], {"transcript": transcript.to_dict()})
+        elif cached["transcript"]:
+            transcript = Transcript.from_dict(cached["transcript"]["transcript"])
+        key_frames = _cached_key_frames(cached["frames"]) if cached["frames"] else None
+        article_content = cached["article"]["article"] if cached["article"] else None
+        
+        if (transcript is None or key_frames is None) and video_path is None:
+            raise Exception("Cached results are no longer available, please submit the video again")
+        video_processor = VideoProcessor(video_path) if video_path else None
+        
+        # Step 1: Extract audio and/or frames
+        audio_path = None
+        frames = None
+        if transcript is None or key_frames is None:
+            async with scheduler.stage("ffmpeg") as waited, timer.stage("extract", waited):
+                if transcript is None and key_frames is None:
+                    audio_path, frames = await video_processor.extract_audio_and_frames()
+                elif transcript is None:
+                    audio_path = await video_processor.extract_audio()
+                else:
+                    frames = await video_processor.extract_frames()
+        
+        await job_store.update_async(job_id, progress=30)
+        
+        # Step 2: Transcribe audio while frame candidates are deduplicated and
+        # prepared; key frame selection starts as soon as enough of the
+        # transcript exists rather than after the last chunk
+        transcript_segments = []
+        enough_context = asyncio.Event()
+        candidates_ready = asyncio.Event()
+        candidates = None
+        
+        async def transcribe():
+            nonlocal transcript
+            try:
+                if transcript is not None:
+                    return
+                await job_store.update_async(job_id, message="Transcribing audio...")
+                async with scheduler.stage("transcribe") as waited, timer.stage("transcribe", waited):
+                    async for chunk in video_processor.stream_transcription(
+                        audio_path, executor=scheduler.process_pool
+                    ):
+                        transcript_segments.extend(chunk["segments"])
+                        coverage = min(1.0, chunk["end"] / chunk["duration"]) if chunk["duration"] else 1.0
+                        await job_store.update_async(
+                            job_id, progress=30 + int(20 * coverage), transcript_coverage=round(coverage, 3)
+                        )
+                        if coverage >= SELECTION_MIN_COVERAGE:
+                            enough_context.set()
+                transcript = Transcript.from_segments(transcript_segments)
+                await artifact_cache.put_async("transcript", keys["transcript"], {"transcript": transcript.to_dict()})
+            finally:
+                enough_context.set()
         
-        frames = await video_processor.extract_frames()
-        jobs[job_id]["progress"] = 30
-        jobs[job_id]["message"] = f"Extracted {len(frames)} frames, transcribing audio..."
+        async def prepare_candidates():
+            nonlocal frames, candidates
+            try:
+                if key_frames is not None:
+                    return
+                async with timer.stage("frame_prep"):
+                    # Collapse near-identical frames so the vision budget goes to distinct content
+                    extracted_count = len(frames)
+                    settings = frame_settings()
+                    if settings["dedup"]:
+                        loop = asyncio.get_event_loop()
+                        frames = await loop.run_in_executor(
+                            None, dedupe_frames, frames, settings["dedup_threshold"]
+                        )
+                    await job_store.update_async(
+                        job_id, message=f"Extracted {extracted_count} frames ({len(frames)} distinct)"
+                    )
+                    candidates = await ai_service.prepare_frame_candidates(frames)
+            finally:
+                candidates_ready.set()
         
-        # Step 2: Transcribe audio
-        transcript = await video_processor.transcribe_audio(audio_path)
-        jobs[job_id]["progress"] = 50
-        jobs[job_id]["message"] = "Transcription complete, analyzing frames with AI..."
+        async def select():
+            nonlocal key_frames
+            if key_frames is not None:
+                return
+            try:
+                await candidates_ready.wait()
+                await enough_context.wait()
+                
+                # Use whatever has been transcribed by now
+                context = transcript if transcript is not None else Transcript.from_segments(transcript_segments)
+                async with scheduler.stage("llm") as waited, timer.stage("selection", waited):
+                    key_frames = await ai_service.select_key_frames(frames, context, candidates)
+            finally:
+                # Their prepared images may be pruned from the cache again
+                if candidates:
+                    ai_service.release_frame_candidates(candidates)
+            
+            # Pull full-resolution versions of the chosen preview frames
+            async with scheduler.stage("ffmpeg") as waited, timer.stage("full_frames", waited):
+                key_frames = await video_processor.extract_full_frames(key_frames)
+            
+            await artifact_cache.put_async(
+                "frames",
+                keys["frames"],
+                {"key_frames": [
+                    {key: value for key, value in frame.items() if key != "path"}
+                    for frame in key_frames
+                ]},
+                files={f"frame_{i}": frame["path"] for i, frame in enumerate(key_frames)}
+            )
         
-        # Step 3: Analyze frames and select key moments
-        key_frames = await ai_service.select_key_frames(frames, transcript)
-        jobs[job_id]["progress"] = 70
-        jobs[job_id]["message"] = f"Selected {len(key_frames)} key frames, generating newsletter..."
+        await _run_together(transcribe(), prepare_candidates(), select())
+        await job_store.update_async(
+            job_id,
+            progress=70,
+            message=f"Selected {len(key_frames)} key frames, generating newsletter...",
+            timeline=timer.as_dict()
+        )
         
-        # Step 4: Generate newsletter
+        # Step 3: Generate newsletter
         output_path = OUTPUT_DIR / job_id
         output_path.mkdir(exist_ok=True)
         
-        jobs[job_id]["progress"] = 75
-        jobs[job_id]["message"] = "Generating Slovenian article..."
+        await job_store.update_async(job_id, progress=75, message="Generating Slovenian article...")
         
-        newsletter_path = await newsletter_gen.generate(
-            transcript=transcript,
-            key_frames=key_frames,
-            output_dir=output_path,
-            ai_service=ai_service
-        )
+        if article_content is None:
+            async with scheduler.stage("llm") as waited, timer.stage("article", waited):
+                article_content = await newsletter_gen.write_article(
+                    transcript, key_frames, ai_service,
+                    on_partial=_partial_article_writer(job_id, output_path)
+                )
+            await artifact_cache.put_async("article", keys["article"], {"article": article_content})
+        
+        async with timer.stage("render"):
+            newsletter_path = await newsletter_gen.generate(
+                transcript=transcript,
+                key_frames=key_frames,
+                output_dir=output_path,
+                ai_service=ai_service,
+                article_content=article_content
+            )
         
-        jobs[job_id]["progress"] = 95
-        jobs[job_id]["message"] = "Proofreading completed, finalizing..."
+        await job_store.update_async(
+            job_id,
+            progress=95,
+            message="Proofreading completed, finalizing...",
+            timeline=timer.as_dict()
+        )
+        # The draft shouldn't end up in the download
+        (output_path / PARTIAL_ARTICLE_NAME).unlink(missing_ok=True)
         
-        jobs[job_id]["progress"] = 100
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["message"] = "Newsletter generated successfully!"
-        jobs[job_id]["result_path"] = str(newsletter_path)
+        await job_store.update_async(
+            job_id,
+            progress=100,
+            status="completed",
+            message="Newsletter generated successfully!",
+            result_path=str(newsletter_path),
+            timeline=timer.as_dict(),
+            llm_usage=ai_service.usage,
+            proofreading=newsletter_gen.proofread_stats
+        )
+        metrics.jobs.inc(status="completed")
         
         # Cleanup uploaded video
-        video_path.unlink(missing_ok=True)
+        if video_path:
+            video_path.unlink(missing_ok=True)
         
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["message"] = f"Error: {str(e)}"
+        await job_store.update_async(
+            job_id,
+            status="failed",
+            error=str(e),
+            message=f"Error: {str(e)}",
+            timeline=timer.as_dict()
+        )
+        metrics.jobs.inc(status="failed")
         print(f"Error processing video {job_id}: {e}")
 
 
+@app.on_event("startup")
+async def start_scheduler():
+    """Start job workers and load the Whisper model in each transcription worker"""
+    warm_up = warm_up_worker if os.getenv("WHISPER_WARMUP", "true").lower() == "true" else None
+    job_events.bind(asyncio.get_running_loop())
+    timings = await scheduler.start(warm_up=warm_up)
+    for worker_timings in timings or []:
+        whisper_registry.record(worker_timings)
+    
+    app.state.expire_task = asyncio.create_task(_expire_jobs_loop())
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    app.state.expire_task.cancel()
+    await scheduler.shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "Video Newsletter Generator API", "status": "running"}
 
 
-@app.post("/api/upload")
-async def upload_video(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
-):
-    """Upload a video file and start processing"""
+@app.post(
+    "/api/upload",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_video(request: Request):
+    """Upload a video file and start processing
+    
+    The multipart body is streamed straight to UPLOAD_DIR instead of being
+    buffered, and the upload is aborted as soon as it exceeds MAX_VIDEO_SIZE.
+    """
+    
+    # Reject obviously oversized uploads before reading the body
+    content_length = request.headers.get("content-length")
+    if content_length:
+        try:
+            declared_size = int(content_length)
+        except ValueError:
+            raise HTTPException(400, "Invalid Content-Length header")
+        if declared_size > MAX_VIDEO_SIZE + MULTIPART_OVERHEAD:
+            raise HTTPException(413, f"Video size exceeds maximum ({MAX_VIDEO_SIZE} bytes)")
     
-    # Validate file
-    if not file.content_type or not file.content_type.startswith("video/"):
-        raise HTTPException(400, "File must be a video")
+    # Reject early instead of storing a video we can't queue
+    if scheduler.is_full():
+        return _queue_full_response(QueueFullError(scheduler.queue_depth))
     
     # Generate job ID
     job_id = str(uuid.uuid4())
     
-    # Save uploaded file
-    video_path = UPLOAD_DIR / f"{job_id}_{file.filename}"
+    # Stream uploaded file to disk
+    upload = StreamingVideoUpload(
+        content_type=request.headers.get("content-type", ""),
+        stream=request.stream(),
+        upload_dir=UPLOAD_DIR,
+        job_id=job_id,
+        max_size=MAX_VIDEO_SIZE,
+    )
     
     try:
-        with video_path.open("wb") as buffer:
-            content = await file.read()
-            if len(content) > MAX_VIDEO_SIZE:
-                raise HTTPException(400, f"Video size exceeds maximum ({MAX_VIDEO_SIZE} bytes)")
-            buffer.write(content)
+        saved = await upload.save()
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e))
+    except InvalidUploadError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         raise HTTPException(500, f"Failed to save video: {str(e)}")
     
+    video_path = saved["path"]
+    
     # Initialize job
-    jobs[job_id] = {
-        "job_id": job_id,
-        "status": "queued",
-        "progress": 0,
-        "message": "Video uploaded, starting processing...",
-        "filename": file.filename
-    }
+    await job_store.create_async(
+        job_id,
+        status="queued",
+        progress=0,
+        message="Video uploaded, waiting in queue...",
+        filename=saved["filename"],
+        size=saved["size"],
+        content_hash=saved["sha256"]
+    )
     
-    # Start background processing
-    background_tasks.add_task(process_video_task, job_id, video_path)
+    # Queue for processing
+    try:
+        position = scheduler.submit(
+            job_id, process_video_task, job_id, video_path, f"sha256:{saved['sha256']}"
+        )
+    except QueueFullError as e:
+        await job_store.delete_async(job_id)
+        video_path.unlink(missing_ok=True)
+        return _queue_full_response(e)
     
-    return {"job_id": job_id, "message": "Video uploaded successfully"}
+    return {"job_id": job_id, "message": "Video uploaded successfully", "queue_position": position}
 
 
 @app.post("/api/upload-youtube")
 async def upload_youtube(
-    background_tasks: BackgroundTasks,
     data: YouTubeUpload
 ):
     """Upload a video from YouTube URL and start processing"""
@@ -183,62 +624,165 @@ async def upload_youtube(
     job_id = str(uuid.uuid4())
     
     # Initialize job
-    jobs[job_id] = {
-        "job_id": job_id,
-        "status": "queued",
-        "progress": 0,
-        "message": "Downloading video from YouTube...",
-        "url": data.url
-    }
+    await job_store.create_async(
+        job_id,
+        status="queued",
+        progress=0,
+        message="Waiting in queue...",
+        url=data.url
+    )
     
-    # Start background processing with YouTube download
-    background_tasks.add_task(process_youtube_task, job_id, data.url)
+    # Queue download and processing
+    try:
+        position = scheduler.submit(job_id, process_youtube_task, job_id, data.url)
+    except QueueFullError as e:
+        await job_store.delete_async(job_id)
+        return _queue_full_response(e)
     
-    return {"job_id": job_id, "message": "YouTube video download started"}
+    return {"job_id": job_id, "message": "YouTube video download started", "queue_position": position}
 
 
 async def process_youtube_task(job_id: str, youtube_url: str):
     """Background task to download and process YouTube video"""
     try:
         # Update status
-        jobs[job_id]["status"] = "downloading"
-        jobs[job_id]["progress"] = 5
-        jobs[job_id]["message"] = "Downloading video from YouTube..."
+        await job_store.update_async(
+            job_id, status="downloading", progress=5, message="Downloading video from YouTube..."
+        )
         
-        # Download video
+        # Skip the download entirely if every stage for this video is cached
         downloader = YouTubeDownloader(UPLOAD_DIR)
-        video_path = downloader.download(youtube_url, job_id)
+        video_id = YouTubeDownloader.video_id(youtube_url)
+        source_key = f"youtube:{video_id}" if video_id else None
+        if source_key:
+            fully_cached, cached_source = _fully_cached_source(source_key, downloader.captions)
+            if fully_cached:
+                await process_video_task(job_id, None, source_key, transcript_source=cached_source)
+                return
+        
+        # Download video
+        async with scheduler.stage("download"):
+            download = await downloader.download_async(
+                youtube_url,
+                job_id,
+                on_progress=lambda progress: _report_download_progress(job_id, progress)
+            )
+        video_path = download["video_path"]
+        
+        # Captions replace Whisper when the policy allows them
+        transcript = None
+        transcript_source = None
+        captions = download["captions"]
+        if captions:
+            transcript = Transcript.from_vtt(captions["path"].read_text(encoding="utf-8"))
+            captions["path"].unlink(missing_ok=True)
+            if len(transcript):
+                transcript_source = _caption_source(captions["language"], captions["automatic"])
+            else:
+                transcript = None
         
-        jobs[job_id]["progress"] = 10
-        jobs[job_id]["message"] = "Video downloaded, starting processing..."
+        message = "Video downloaded, starting processing..."
+        if transcript is not None:
+            message = "Video downloaded, using its captions instead of transcribing..."
+        await job_store.update_async(job_id, progress=10, message=message)
         
         # Continue with normal video processing
-        await process_video_task(job_id, video_path)
+        await process_video_task(job_id, video_path, source_key, transcript, transcript_source)
         
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["message"] = f"Error downloading video: {str(e)}"
+        await job_store.update_async(
+            job_id, status="failed", error=str(e), message=f"Error downloading video: {str(e)}"
+        )
         print(f"Error processing YouTube video {job_id}: {e}")
 
 
 @app.get("/api/status/{job_id}")
 async def get_status(job_id: str):
     """Get processing status for a job"""
-    if job_id not in jobs:
+    status = await job_store.get_async(job_id)
+    if status is None:
         raise HTTPException(404, "Job not found")
     
-    return jobs[job_id]
+    status["queue_depth"] = scheduler.queue_depth
+    status["queue_position"] = scheduler.queue_position(job_id)
+    queue_wait = scheduler.queue_wait(job_id)
+    if queue_wait is not None:
+        status["queue_wait_seconds"] = round(queue_wait, 3)
+    
+    return status
+
+
+def _event_stream_response(request: Request, job_ids: List[str]) -> StreamingResponse:
+    stream = job_event_stream(
+        job_store,
+        job_events,
+        job_ids,
+        last_event_id=request.headers.get("last-event-id"),
+        is_disconnected=request.is_disconnected,
+    )
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        # no-transform keeps compressing proxies (e.g. the CRA dev proxy)
+        # from buffering the stream into bursts
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/events/{job_id}")
+async def job_events_stream(job_id: str, request: Request):
+    """Stream status and progress changes for a job as server-sent events"""
+    if await job_store.get_async(job_id) is None:
+        raise HTTPException(404, "Job not found")
+    
+    return _event_stream_response(request, [job_id])
+
+
+@app.get("/api/events")
+async def jobs_events_stream(job_ids: str, request: Request):
+    """Stream changes for several jobs (comma-separated IDs) on one connection"""
+    ids = list(dict.fromkeys(job_id.strip() for job_id in job_ids.split(",") if job_id.strip()))
+    if not ids:
+        raise HTTPException(400, "No job IDs given")
+    if len(ids) > MAX_STREAM_JOBS:
+        raise HTTPException(400, f"At most {MAX_STREAM_JOBS} jobs per stream")
+    
+    missing = [job_id for job_id in ids if await job_store.get_async(job_id) is None]
+    if missing:
+        raise HTTPException(404, f"Jobs not found: {', '.join(missing)}")
+    
+    return _event_stream_response(request, ids)
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Get process-wide performance metrics"""
+    return {
+        "whisper": whisper_registry.stats(),
+        "scheduler": scheduler.stats(),
+        "artifact_cache": artifact_cache.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage and Claude call histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/api/preview/{job_id}")
 async def preview_newsletter(job_id: str):
     """Get the markdown content for preview"""
-    if job_id not in jobs:
+    job = await job_store.get_async(job_id)
+    if job is None:
         raise HTTPException(404, "Job not found")
     
-    job = jobs[job_id]
     if job["status"] != "completed":
+        # While the article is being written, serve the draft so far
+        partial_path = OUTPUT_DIR / job_id / PARTIAL_ARTICLE_NAME
+        if job["status"] == "processing" and partial_path.exists():
+            content = partial_path.read_text(encoding="utf-8")
+            return {"content": content, "job_id": job_id, "partial": True}
         raise HTTPException(400, "Job not completed yet")
     
     result_path = Path(job["result_path"])
@@ -246,41 +790,44 @@ async def preview_newsletter(job_id: str):
         raise HTTPException(404, "Newsletter file not found")
     
     content = result_path.read_text(encoding="utf-8")
-    return {"content": content, "job_id": job_id}
+    return {"content": content, "job_id": job_id, "partial": False}
 
 
 @app.get("/api/download/{job_id}")
-async def download_newsletter(job_id: str):
+async def download_newsletter(job_id: str, request: Request):
     """Download the generated newsletter as a zip file"""
-    if job_id not in jobs:
+    job = await job_store.get_async(job_id)
+    if job is None:
         raise HTTPException(404, "Job not found")
     
-    job = jobs[job_id]
     if job["status"] != "completed":
         raise HTTPException(400, "Job not completed yet")
     
-    # Create zip file
     output_dir = OUTPUT_DIR / job_id
     if not output_dir.exists():
         raise HTTPException(404, "Output directory not found")
     
-    zip_path = OUTPUT_DIR / f"{job_id}_newsletter"
-    shutil.make_archive(str(zip_path), "zip", output_dir)
+    # The zip holds every format; the archive is rebuilt only when the
+    # outputs changed since the last download (e.g. formats rendered since)
+    await ExportFormatter(output_dir).get_all()
+    zip_path, fingerprint = await archives.get(job_id)
     
-    return FileResponse(
-        f"{zip_path}.zip",
+    return file_response(
+        request,
+        zip_path,
         media_type="application/zip",
-        filename=f"newsletter_{job_id}.zip"
+        filename=f"newsletter_{job_id}.zip",
+        etag=fingerprint
     )
 
 
 @app.get("/api/download/{job_id}/{format}")
-async def download_newsletter_format(job_id: str, format: str):
+async def download_newsletter_format(job_id: str, format: str, request: Request):
     """Download newsletter in specific format (markdown, html, docx)"""
-    if job_id not in jobs:
+    job = await job_store.get_async(job_id)
+    if job is None:
         raise HTTPException(404, "Job not found")
     
-    job = jobs[job_id]
     if job["status"] != "completed":
         raise HTTPException(400, "Job not completed yet")
     
@@ -288,46 +835,37 @@ async def download_newsletter_format(job_id: str, format: str):
     if not output_dir.exists():
         raise HTTPException(404, "Output directory not found")
     
-    # Map format to file
-    format_map = {
-        "markdown": ("newsletter.md", "text/markdown"),
-        "html": ("newsletter.html", "text/html"),
-        "docx": ("newsletter.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-    }
-    
-    if format not in format_map:
-        raise HTTPException(400, f"Invalid format. Supported: {', '.join(format_map.keys())}")
+    if format not in FORMATS:
+        raise HTTPException(400, f"Invalid format. Supported: {', '.join(FORMATS.keys())}")
     
-    filename, media_type = format_map[format]
-    file_path = output_dir / filename
+    formatter = ExportFormatter(output_dir)
+    if not formatter.path("markdown").exists():
+        raise HTTPException(404, "Newsletter file not found")
     
-    if not file_path.exists():
-        raise HTTPException(404, f"{format.upper()} file not found")
+    # Rendered on first request, then served from disk
+    file_path = await formatter.get(format)
     
-    return FileResponse(
+    return file_response(
+        request,
         file_path,
-        media_type=media_type,
-        filename=filename
+        media_type=FORMATS[format]["media_type"],
+        filename=FORMATS[format]["filename"]
     )
 
 
 @app.delete("/api/job/{job_id}")
 async def delete_job(job_id: str):
     """Delete a job and its associated files"""
-    if job_id not in jobs:
+    if await job_store.get_async(job_id) is None:
         raise HTTPException(404, "Job not found")
     
-    # Delete output directory
-    output_dir = OUTPUT_DIR / job_id
-    if output_dir.exists():
-        shutil.rmtree(output_dir)
+    # Drop from the queue if it hasn't started yet
+    scheduler.cancel(job_id)
     
-    # Delete uploaded video if still exists
-    for video_file in UPLOAD_DIR.glob(f"{job_id}_*"):
-        video_file.unlink(missing_ok=True)
+    _delete_job_files(job_id)
     
-    # Remove from jobs
-    del jobs[job_id]
+    # Remove from the store
+    await job_store.delete_async(job_id)
     
     return {"message": "Job deleted successfully"}
 
@@ -0,0 +1,133 @@
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+
+# Seconds; pipeline stages range from milliseconds (cache hits) to many minutes
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in the Prometheus layout"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: [bucket counts..., sum, count]
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = (("le", _format_value(bound)),)
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide pipeline metrics in the Prometheus text format
+
+    Each worker process keeps its own registry; with several uvicorn
+    workers, scrape each one or aggregate in Prometheus.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "newsletter_stage_duration_seconds", "Wall time of a pipeline stage", STAGE_BUCKETS
+        )
+        self.stage_wait_seconds = Histogram(
+            "newsletter_stage_wait_seconds",
+            "Time a pipeline stage waited for a scheduler slot", STAGE_BUCKETS
+        )
+        self.llm_seconds = Histogram(
+            "newsletter_llm_request_duration_seconds",
+            "Claude call latency including retries", LLM_BUCKETS
+        )
+        self.llm_first_token_seconds = Histogram(
+            "newsletter_llm_time_to_first_token_seconds",
+            "Time to the first streamed token of a Claude call", LLM_BUCKETS
+        )
+        self.llm_tokens = Counter("newsletter_llm_tokens_total", "Claude tokens by phase and type")
+        self.llm_retries = Counter("newsletter_llm_retries_total", "Retried Claude requests")
+        self.jobs = Counter("newsletter_jobs_total", "Finished jobs by status")
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.stage_seconds,
+            self.stage_wait_seconds,
+            self.llm_seconds,
+            self.llm_first_token_seconds,
+            self.llm_tokens,
+            self.llm_retries,
+            self.jobs,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
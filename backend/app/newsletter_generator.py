@@ -1,47 +1,102 @@
 import shutil
+import asyncio
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from app.ai_service import AIService
-from app.export_formatter import ExportFormatter
+from app.image_variants import write_all_variants
+from app.proofreader import Proofreader, split_blocks
+from app.transcript import Transcript
 
 
 class NewsletterGenerator:
     """Generates newsletter markdown with embedded images"""
     
+    def __init__(self):
+        # Block counts of the last write_article() (see Proofreader.stats)
+        self.proofread_stats: Dict[str, int] = {}
+    
+    async def write_article(
+        self,
+        transcript: Transcript,
+        key_frames: List[Dict],
+        ai_service: AIService,
+        on_partial: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Generate and proofread the Slovenian article text
+        
+        The draft is streamed and every paragraph is handed to the
+        Proofreader as soon as it is finished, so proofreading runs
+        concurrently with the rest of the generation.
+        
+        Args:
+            transcript: Video transcript
+            key_frames: Selected frames with captions
+            ai_service: Claude client
+            on_partial: Called with the draft so far after each streamed delta
+        """
+        proofreader = Proofreader(ai_service)
+        draft = ""
+        sent = 0  # draft[:sent] has been handed to the proofreader
+        blocks: List[asyncio.Task] = []
+        try:
+            async for text in ai_service.stream_newsletter_content(transcript, key_frames):
+                draft += text
+                if on_partial:
+                    on_partial(draft)
+                
+                boundary = draft.rfind("\n\n", sent)
+                if boundary > sent:
+                    blocks.extend(
+                        asyncio.create_task(proofreader.proofread_block(block))
+                        for block in split_blocks(draft[sent:boundary])
+                    )
+                    sent = boundary + 2
+            
+            blocks.extend(
+                asyncio.create_task(proofreader.proofread_block(block))
+                for block in split_blocks(draft[sent:])
+            )
+            proofread = await asyncio.gather(*blocks)
+        except BaseException:
+            for task in blocks:
+                task.cancel()
+            await asyncio.gather(*blocks, return_exceptions=True)
+            raise
+        
+        self.proofread_stats = dict(proofreader.stats)
+        return "\n\n".join(proofread)
+    
     async def generate(
         self,
-        transcript: str,
+        transcript: Transcript,
         key_frames: List[Dict],
         output_dir: Path,
-        ai_service: AIService
+        ai_service: AIService,
+        article_content: Optional[str] = None
     ) -> Path:
-        """Generate newsletter markdown file with images"""
+        """Generate newsletter markdown file with images
+        
+        If `article_content` is given (e.g. from the artifact cache), the
+        article isn't regenerated.
+        """
         
         # Create images directory
         images_dir = output_dir / "images"
         images_dir.mkdir(exist_ok=True)
         
-        # Copy images to output directory
+        # Write size-appropriate variants of the frames (see image_variants)
+        variants = await write_all_variants([frame["path"] for frame in key_frames], images_dir)
         frame_references = []
-        for i, frame in enumerate(key_frames):
-            # Copy image
-            image_name = f"frame_{i+1}.jpg"
-            image_dest = images_dir / image_name
-            shutil.copy(frame["path"], image_dest)
-            
+        for frame, names in zip(key_frames, variants):
             frame_references.append({
-                "path": f"images/{image_name}",
+                "path": f"images/{names['web']}",
                 "caption": frame["caption"],
                 "timestamp": frame["timestamp"]
             })
         
         # Generate article content using AI
-        article_content = await ai_service.generate_newsletter_content(
-            transcript, key_frames
-        )
-        
-        # Proofread and improve Slovenian text
-        article_content = await ai_service.proofread_slovenian(article_content)
+        if article_content is None:
+            article_content = await self.write_article(transcript, key_frames, ai_service)
         
         # Build markdown
         markdown_parts = []
@@ -83,9 +138,8 @@ class NewsletterGenerator:
         newsletter_path = output_dir / "newsletter.md"
         newsletter_path.write_text(markdown_content, encoding="utf-8")
         
-        # Create additional formats (HTML for Notion, DOCX for Word)
-        formatter = ExportFormatter(output_dir)
-        formatter.create_all_formats(markdown_content, output_dir / "images")
+        # HTML and DOCX are rendered from this file on first download
+        # (see ExportFormatter)
         
         # Clean up temporary frames
         for frame in key_frames:
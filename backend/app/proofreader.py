@@ -0,0 +1,120 @@
+import os
+import re
+import asyncio
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+from app.ai_service import AIService
+
+
+# Blocks the model never needs to see: markdown images and horizontal rules
+_STRUCTURAL_BLOCK = re.compile(r"^(!\[.*\]\(.*\)|[-*_]{3,})$")
+
+# Cheap mechanical checks; any hit sends the block to the model
+_LOCAL_CHECKS = {
+    "double_space": re.compile(r"\S  +\S"),
+    "space_before_punctuation": re.compile(r"\s[,.!?:;]"),
+    "missing_space_after_punctuation": re.compile(r"[,;](?=[^\s\d])"),
+    "repeated_word": re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE),
+    "lowercase_sentence_start": re.compile(r"[.!?]\s+[a-zčšž]"),
+    "english_word": re.compile(r"\b(the|and|with|which|this|that|is|are)\b", re.IGNORECASE),
+    "straight_quotes": re.compile(r"\""),
+}
+
+
+def proofread_settings() -> Dict:
+    """Proofreading settings from the environment"""
+    return {
+        "concurrency": int(os.getenv("PROOFREAD_CONCURRENCY", 4)),
+        # Paragraphs up to this long that pass the local checks skip the model
+        "clean_max_chars": int(os.getenv("PROOFREAD_CLEAN_MAX_CHARS", 400)),
+        # Model output less similar than this to its input is discarded
+        "min_similarity": float(os.getenv("PROOFREAD_MIN_SIMILARITY", 0.6)),
+    }
+
+
+def split_blocks(text: str) -> List[str]:
+    """Split an article on blank lines, the same way NewsletterGenerator does"""
+    return [block.strip() for block in text.split("\n\n") if block.strip()]
+
+
+def local_issues(text: str) -> List[str]:
+    """Names of the local checks a paragraph fails"""
+    issues = [name for name, pattern in _LOCAL_CHECKS.items() if pattern.search(text)]
+    if not text.startswith(("-", "*", "1.")) and text[-1] not in ".!?:\"“”«»)":
+        issues.append("no_terminal_punctuation")
+    return issues
+
+
+class Proofreader:
+    """
+    Proofreads an article paragraph by paragraph
+
+    Blocks (split on blank lines) are proofread concurrently, at most
+    `concurrency` at a time, so wall-clock time follows the longest
+    paragraph rather than the whole article. Headings are kept verbatim,
+    short paragraphs that pass the local checks are not sent at all, and a
+    corrected paragraph that drifts too far from the original (e.g. the
+    model added commentary or rewrote it) is discarded in favour of the
+    original.
+    """
+
+    def __init__(self, ai_service: AIService, settings: Optional[Dict] = None):
+        settings = settings or proofread_settings()
+        self.ai_service = ai_service
+        self.clean_max_chars = settings["clean_max_chars"]
+        self.min_similarity = settings["min_similarity"]
+        self._semaphore = asyncio.Semaphore(settings["concurrency"])
+        self.stats = {"blocks": 0, "skipped": 0, "rejected": 0}
+
+    async def proofread(self, text: str) -> str:
+        """Proofread a whole article, keeping its block structure"""
+        blocks = await asyncio.gather(*(self.proofread_block(block) for block in split_blocks(text)))
+        return "\n\n".join(blocks)
+
+    async def proofread_block(self, block: str) -> str:
+        """
+        Proofread one block of an article
+
+        Leading heading lines are kept as they are and only the text under
+        them is proofread.
+        """
+        block = block.strip()
+        self.stats["blocks"] += 1
+
+        lines = block.split("\n")
+        heading_count = 0
+        while heading_count < len(lines) and lines[heading_count].lstrip().startswith("#"):
+            heading_count += 1
+        headings = lines[:heading_count]
+        body = "\n".join(lines[heading_count:]).strip()
+
+        if not body or self._is_clean(body):
+            self.stats["skipped"] += 1
+            return block
+
+        async with self._semaphore:
+            corrected = await self.ai_service.proofread_slovenian(
+                body,
+                # Slovenian runs ~3 characters per token; leave room for edits
+                max_tokens=min(4500, len(body) // 2 + 200)
+            )
+
+        if not self._accept(body, corrected):
+            self.stats["rejected"] += 1
+            corrected = body
+        return "\n".join(headings + [corrected])
+
+    def _is_clean(self, body: str) -> bool:
+        if _STRUCTURAL_BLOCK.match(body):
+            return True
+        return len(body) <= self.clean_max_chars and not local_issues(body)
+
+    def _accept(self, original: str, corrected: str) -> bool:
+        """Whether a proofread paragraph can replace the original"""
+        if not corrected:
+            return False
+        # A proofread paragraph must stay one paragraph
+        if "\n\n" in corrected and "\n\n" not in original:
+            return False
+        return SequenceMatcher(None, original, corrected).ratio() >= self.min_similarity
@@ -0,0 +1,74 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from app.metrics import metrics
+
+
+class StageTimer:
+    """
+    Timeline of one job: each pipeline stage and each Claude call
+
+    Stages may overlap, so each one records when it started (relative to
+    the timer's creation) as well as how long it took; a stage entered more
+    than once accumulates its duration. Stages gated by the scheduler are
+    timed from when they got their slot, and the time spent waiting for it
+    is recorded separately as `wait_seconds`.
+
+    Stage durations and waits also feed the process-wide /metrics histograms.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._calls: List[Dict] = []
+
+    @asynccontextmanager
+    async def stage(self, name: str, wait_seconds: Optional[float] = None):
+        """
+        Time a stage
+
+        Args:
+            name: Stage name
+            wait_seconds: Time the stage waited for its scheduler slot, as
+                yielded by JobScheduler.stage()
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            entry = self._stages.setdefault(name, {"start": start - self._origin, "seconds": 0.0})
+            entry["seconds"] += end - start
+            entry["end"] = end - self._origin
+            metrics.stage_seconds.observe(end - start, stage=name)
+            if wait_seconds is not None:
+                entry["wait_seconds"] = entry.get("wait_seconds", 0.0) + wait_seconds
+                metrics.stage_wait_seconds.observe(wait_seconds, stage=name)
+
+    def add_call(self, phase: str, start: float, **fields):
+        """
+        Record one Claude call
+
+        Args:
+            phase: Pipeline phase the call belongs to (selection, article, ...)
+            start: time.perf_counter() when the call started
+            fields: Call details (seconds, tokens, retries, ...)
+        """
+        call = {"phase": phase, "start": start - self._origin, **fields}
+        self._calls.append({
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in call.items()
+        })
+
+    def as_dict(self) -> Dict:
+        """Rounded timings per stage, the Claude calls and the elapsed total"""
+        stages = {
+            name: {key: round(value, 3) for key, value in entry.items()}
+            for name, entry in self._stages.items()
+        }
+        return {
+            "stages": stages,
+            "calls": list(self._calls),
+            "total_seconds": round(time.perf_counter() - self._origin, 3),
+        }
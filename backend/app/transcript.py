@@ -0,0 +1,215 @@
+import re
+import html
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional
+
+
+_VTT_TIMING = re.compile(
+    r"^((?:\d+:)?\d{1,2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}\.\d{3})"
+)
+_VTT_TAG = re.compile(r"<[^>]*>")
+
+
+def _vtt_seconds(timestamp: str) -> float:
+    seconds = 0.0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_vtt(text: str) -> List[Dict]:
+    """
+    WebVTT cues as Whisper-style segments (start, end, text)
+
+    YouTube's automatic captions repeat the previous line at the top of
+    every cue (rolling captions) and tag each word with its timing; tags
+    are stripped and a line already emitted by the previous cue is skipped,
+    so every spoken line appears once.
+    """
+    segments = []
+    previous_lines: List[str] = []
+    # Only empty lines end a cue; YouTube puts whitespace-only lines inside cues
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        lines = block.strip().split("\n")
+        timing_index = next((i for i, line in enumerate(lines) if _VTT_TIMING.match(line)), None)
+        if timing_index is None:
+            # Header, NOTE, STYLE or REGION block
+            continue
+        match = _VTT_TIMING.match(lines[timing_index])
+        start, end = _vtt_seconds(match.group(1)), _vtt_seconds(match.group(2))
+
+        cue_lines = [
+            " ".join(html.unescape(_VTT_TAG.sub("", line)).split())
+            for line in lines[timing_index + 1:]
+        ]
+        cue_lines = [line for line in cue_lines if line]
+        new_lines = [line for line in cue_lines if line not in previous_lines]
+        if cue_lines:
+            previous_lines = cue_lines
+        if new_lines:
+            segments.append({"start": start, "end": end, "text": " ".join(new_lines)})
+    return segments
+
+
+class Transcript:
+    """
+    Timestamped transcript segments
+
+    Segments are stored as parallel arrays (start and end seconds, text)
+    sorted by start time. A running maximum of the end times makes
+    window() a pair of bisections instead of a scan, so each frame can be
+    paired with what was said around it cheaply.
+
+    A transcript built from plain text (no timing) has a single segment
+    and `timed` set to False.
+    """
+
+    def __init__(
+        self,
+        starts: Iterable[float],
+        ends: Iterable[float],
+        texts: Iterable[str],
+        timed: bool = True
+    ):
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.texts: List[str] = list(texts)
+        self.timed = timed
+        if not (len(self.starts) == len(self.ends) == len(self.texts)):
+            raise ValueError("Transcript arrays must have the same length")
+
+        # Segments from separate chunks may overlap slightly, so index on the
+        # running maximum of end times rather than the ends themselves
+        self._max_ends = array("d")
+        running = float("-inf")
+        for end in self.ends:
+            running = max(running, end)
+            self._max_ends.append(running)
+
+        self._text: Optional[str] = None
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict]) -> "Transcript":
+        """Build from Whisper-style segments (dicts with start, end, text)"""
+        ordered = sorted(
+            (segment for segment in segments if segment["text"].strip()),
+            key=lambda segment: segment["start"]
+        )
+        return cls(
+            [segment["start"] for segment in ordered],
+            [segment["end"] for segment in ordered],
+            [segment["text"].strip() for segment in ordered],
+        )
+
+    @classmethod
+    def from_text(cls, text: str) -> "Transcript":
+        """Wrap untimed text, e.g. a transcript from before segments were kept"""
+        text = text.strip()
+        if not text:
+            return cls([], [], [], timed=False)
+        return cls([0.0], [0.0], [text], timed=False)
+
+    @classmethod
+    def from_vtt(cls, text: str) -> "Transcript":
+        """Build from WebVTT captions (e.g. YouTube subtitles)"""
+        return cls.from_segments(parse_vtt(text))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Transcript":
+        return cls(data["starts"], data["ends"], data["texts"], data.get("timed", True))
+
+    def to_dict(self) -> Dict:
+        return {
+            "starts": list(self.starts),
+            "ends": list(self.ends),
+            "texts": self.texts,
+            "timed": self.timed,
+        }
+
+    @property
+    def text(self) -> str:
+        """Full transcript text"""
+        if self._text is None:
+            self._text = " ".join(self.texts)
+        return self._text
+
+    @property
+    def duration(self) -> float:
+        return self._max_ends[-1] if self._max_ends else 0.0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def segment_range(self, start: float, end: float) -> range:
+        """Indexes of the segments overlapping [start, end]"""
+        first = bisect_left(self._max_ends, start)
+        last = bisect_right(self.starts, end)
+        return range(first, max(first, last))
+
+    def window(self, start: float, end: float, max_chars: Optional[int] = None) -> str:
+        """
+        Text spoken between `start` and `end` seconds
+
+        Args:
+            start: Window start in seconds
+            end: Window end in seconds
+            max_chars: Trim the result to about this many characters,
+                keeping the segments closest to the middle of the window
+        """
+        if not self.timed:
+            return self.text[:max_chars] if max_chars else self.text
+
+        indexes = self.segment_range(start, end)
+        if max_chars is None:
+            return " ".join(self.texts[i] for i in indexes)
+
+        # Grow outwards from the segment nearest the middle of the window
+        middle = (start + end) / 2
+        ordered = sorted(indexes, key=lambda i: abs((self.starts[i] + self.ends[i]) / 2 - middle))
+        chosen = []
+        length = 0
+        for i in ordered:
+            length += len(self.texts[i]) + 1
+            if chosen and length > max_chars:
+                break
+            chosen.append(i)
+        return " ".join(self.texts[i] for i in sorted(chosen))[:max_chars]
+
+    def split(self, max_chars: int) -> List["Transcript"]:
+        """
+        Consecutive pieces of about `max_chars` characters each
+
+        Timed transcripts are split between segments; untimed ones between
+        sentences. A single segment longer than `max_chars` stays whole.
+        """
+        if self.timed:
+            units = list(zip(self.starts, self.ends, self.texts))
+        else:
+            units = [(0.0, 0.0, sentence) for sentence in re.split(r"(?<=[.!?])\s+", self.text) if sentence]
+
+        pieces = []
+        current = []
+        length = 0
+        for unit in units:
+            if current and length + len(unit[2]) + 1 > max_chars:
+                pieces.append(current)
+                current = []
+                length = 0
+            current.append(unit)
+            length += len(unit[2]) + 1
+        if current:
+            pieces.append(current)
+
+        return [
+            Transcript(
+                [start for start, _, _ in piece],
+                [end for _, end, _ in piece],
+                [text for _, _, text in piece],
+                timed=self.timed,
+            )
+            for piece in pieces
+        ]
@@ -0,0 +1,287 @@
+import os
+import wave
+import asyncio
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+
+from app.job_scheduler import transcribe_workers
+from app.whisper_registry import whisper_registry
+
+
+SAMPLE_RATE = 16000  # extract_audio writes 16 kHz mono PCM
+VAD_FRAME_MS = 30
+VAD_SMOOTH_MS = 300
+SPEECH_MARGIN_DB = 10  # above the noise floor
+MIN_SPEECH_DB = -50  # dBFS; quieter frames are never speech
+
+
+def transcription_settings() -> Dict:
+    """Transcription settings from the environment"""
+    return {
+        # chunked: split at silences and transcribe chunks in parallel
+        # single: one Whisper call over the whole file
+        # Default: chunked only when there are workers to run chunks in
+        # parallel, since chunks cost Whisper context and 30 s window padding
+        "mode": os.getenv("TRANSCRIBE_MODE") or ("chunked" if transcribe_workers() > 1 else "single"),
+        "chunk_seconds": float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", 60)),
+        "min_chunk_seconds": float(os.getenv("TRANSCRIBE_MIN_CHUNK_SECONDS", 20)),
+        "language": "en",
+    }
+
+
+def load_wav(audio_path: Path, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+    """
+    Read 16-bit mono PCM samples as float32 in [-1, 1]
+
+    Args:
+        audio_path: WAV file from extract_audio
+        start: First sample to read
+        end: Sample to stop at (default: end of file)
+    """
+    with wave.open(str(audio_path), "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise Exception(f"Expected 16-bit mono audio: {audio_path}")
+        total = wav.getnframes()
+        end = total if end is None else min(end, total)
+        wav.setpos(start)
+        raw = wav.readframes(max(0, end - start))
+    return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def wav_duration(audio_path: Path) -> float:
+    """Length of a WAV file in seconds"""
+    with wave.open(str(audio_path), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def frame_energy_db(samples: np.ndarray, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """RMS level in dBFS of consecutive non-overlapping frames"""
+    frame_len = SAMPLE_RATE * frame_ms // 1000
+    count = len(samples) // frame_len
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:count * frame_len].reshape(count, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-5))
+
+
+def wav_energy_db(audio_path: Path, block_seconds: int = 60) -> Tuple[np.ndarray, int]:
+    """
+    Frame energies of a whole WAV file, read block by block
+
+    Returns:
+        (energy, total_samples)
+    """
+    frame_len = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    block = block_seconds * SAMPLE_RATE // frame_len * frame_len
+    with wave.open(str(audio_path), "rb") as wav:
+        total = wav.getnframes()
+
+    energies = [
+        frame_energy_db(load_wav(audio_path, start, start + block))
+        for start in range(0, total, block)
+    ]
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    return energy, total
+
+
+def plan_chunks(
+    energy: np.ndarray,
+    total_samples: int,
+    chunk_seconds: float,
+    min_chunk_seconds: float
+) -> List[Tuple[int, int]]:
+    """
+    Split audio into chunks at silence boundaries
+
+    Each cut is placed at the quietest point (smoothed frame energy) between
+    `min_chunk_seconds` and `chunk_seconds` after the previous cut, so words
+    are rarely split. Chunks without any frame above the speech threshold
+    (noise floor + SPEECH_MARGIN_DB) are dropped, which also keeps Whisper
+    from hallucinating text over long silences.
+
+    Args:
+        energy: Frame energies from wav_energy_db()
+        total_samples: Length of the audio in samples
+        chunk_seconds: Longest chunk
+        min_chunk_seconds: Shortest chunk, except for the last one
+
+    Returns:
+        (start_sample, end_sample) ranges in time order
+    """
+    if len(energy) == 0:
+        return []
+
+    frame_len = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    smooth = max(1, VAD_SMOOTH_MS // VAD_FRAME_MS)
+    smoothed = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+    noise_floor = np.percentile(energy, 10)
+    if energy.max() - noise_floor < SPEECH_MARGIN_DB:
+        # No quiet/loud contrast to go by (e.g. a constant music bed); only
+        # drop digital silence
+        threshold = MIN_SPEECH_DB
+    else:
+        threshold = max(noise_floor + SPEECH_MARGIN_DB, MIN_SPEECH_DB)
+
+    max_frames = max(1, int(chunk_seconds * 1000 / VAD_FRAME_MS))
+    min_frames = min(max_frames, int(min_chunk_seconds * 1000 / VAD_FRAME_MS))
+
+    bounds = [0]
+    while len(energy) - bounds[-1] > max_frames:
+        window_start = bounds[-1] + min_frames
+        window_end = bounds[-1] + max_frames
+        bounds.append(window_start + int(np.argmin(smoothed[window_start:window_end])))
+    bounds.append(len(energy))
+
+    chunks = []
+    for start, end in zip(bounds, bounds[1:]):
+        if energy[start:end].max() > threshold:
+            # The partial frame at the end of the file belongs to the last chunk
+            end_sample = total_samples if end == len(energy) else end * frame_len
+            chunks.append((start * frame_len, end_sample))
+    return chunks
+
+
+def transcribe_chunk(
+    audio_path: Path,
+    start: int,
+    end: int,
+    language: str
+) -> Tuple[List[dict], Dict]:
+    """
+    Transcribe one chunk of a WAV file (process pool entry point)
+
+    Returns:
+        Segments with timestamps relative to the whole file, and the
+        registry timings of this call
+    """
+    samples = load_wav(audio_path, start, end)
+    result, timings = whisper_registry.transcribe(samples, language=language)
+
+    offset = start / SAMPLE_RATE
+    segments = [
+        {
+            "start": round(segment["start"] + offset, 3),
+            "end": round(segment["end"] + offset, 3),
+            "text": segment["text"].strip(),
+        }
+        for segment in result.get("segments", [])
+    ]
+    if not segments and result.get("text", "").strip():
+        segments = [{"start": offset, "end": end / SAMPLE_RATE, "text": result["text"].strip()}]
+    return segments, timings
+
+
+def transcribe_file(audio_path: Path, language: str) -> Tuple[List[dict], Dict]:
+    """Transcribe a whole WAV file in one Whisper call (process pool entry point)"""
+    result, timings = whisper_registry.transcribe(audio_path, language=language)
+    segments = [
+        {
+            "start": round(segment["start"], 3),
+            "end": round(segment["end"], 3),
+            "text": segment["text"].strip(),
+        }
+        for segment in result.get("segments", [])
+    ]
+    if not segments and result.get("text", "").strip():
+        segments = [{"start": 0.0, "end": 0.0, "text": result["text"].strip()}]
+    return segments, timings
+
+
+class TranscriptionEngine:
+    """
+    Transcribes audio as silence-delimited chunks across a process pool
+
+    Chunk boundaries come from a cheap energy VAD over the 16 kHz samples.
+    Each chunk is transcribed independently by whichever pool worker is
+    free, and the segments are stitched back together using each chunk's
+    start offset.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = settings or transcription_settings()
+        self.mode = settings["mode"]
+        self.chunk_seconds = settings["chunk_seconds"]
+        self.min_chunk_seconds = settings["min_chunk_seconds"]
+        self.language = settings["language"]
+
+    def plan(self, audio_path: Path) -> List[Tuple[int, int]]:
+        energy, total_samples = wav_energy_db(audio_path)
+        return plan_chunks(energy, total_samples, self.chunk_seconds, self.min_chunk_seconds)
+
+    async def stream(
+        self,
+        audio_path: Path,
+        executor: Optional[Executor] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Transcribe a WAV file, yielding chunks in time order as they finish
+
+        All chunks are submitted to the pool up front; a chunk is yielded as
+        soon as it and every chunk before it are done.
+
+        Args:
+            audio_path: 16 kHz mono WAV produced by extract_audio
+            executor: Pool to run Whisper in (defaults to the loop's thread pool)
+
+        Yields:
+            Dicts with the chunk's "segments", its "end" and the audio
+            "duration" in seconds, and the "timings" of the Whisper call
+        """
+        loop = asyncio.get_event_loop()
+        duration = wav_duration(audio_path)
+
+        if self.mode == "single":
+            segments, timings = await loop.run_in_executor(
+                executor, transcribe_file, audio_path, self.language
+            )
+            yield {"segments": segments, "end": duration, "duration": duration, "timings": timings}
+            return
+
+        if self.mode != "chunked":
+            raise ValueError(f"Unknown TRANSCRIBE_MODE: {self.mode}")
+
+        chunks = await loop.run_in_executor(None, self.plan, audio_path)
+        futures = [
+            loop.run_in_executor(executor, transcribe_chunk, audio_path, start, end, self.language)
+            for start, end in chunks
+        ]
+        try:
+            for (_, end), future in zip(chunks, futures):
+                segments, timings = await future
+                yield {
+                    "segments": segments,
+                    "end": end / SAMPLE_RATE,
+                    "duration": duration,
+                    "timings": timings,
+                }
+        finally:
+            # Stop queued chunks if the consumer gives up early
+            for future in futures:
+                future.cancel()
+
+    async def transcribe(self, audio_path: Path, executor: Optional[Executor] = None) -> Dict:
+        """
+        Transcribe a WAV file
+
+        Args:
+            audio_path: 16 kHz mono WAV produced by extract_audio
+            executor: Pool to run Whisper in (defaults to the loop's thread pool)
+
+        Returns:
+            Dict with "text", "segments" (start/end in seconds and text), the
+            number of "chunks" and per-call "timings"
+        """
+        segments = []
+        timings = []
+        async for chunk in self.stream(audio_path, executor):
+            segments.extend(chunk["segments"])
+            timings.append(chunk["timings"])
+        return {
+            "text": " ".join(segment["text"] for segment in segments if segment["text"]),
+            "segments": segments,
+            "chunks": len(timings),
+            "timings": timings,
+        }
@@ -0,0 +1,171 @@
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+import aiofiles
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised as soon as an upload grows past the size limit"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Video size exceeds maximum ({max_size} bytes)")
+        self.max_size = max_size
+
+
+class InvalidUploadError(Exception):
+    """Raised when the request body isn't a usable video upload"""
+
+
+class StreamingVideoUpload:
+    """
+    Streams a multipart/form-data video upload straight to disk
+
+    The request body is fed through the multipart parser chunk by chunk and
+    the file part is appended to `upload_dir/{job_id}_{filename}` as it
+    arrives, so memory use stays constant regardless of the video size. The
+    size limit is enforced during transfer and a SHA-256 of the content is
+    computed on the fly.
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        stream: AsyncIterator[bytes],
+        upload_dir: Path,
+        job_id: str,
+        max_size: int,
+        field_name: str = "file"
+    ):
+        self.content_type = content_type
+        self.stream = stream
+        self.upload_dir = upload_dir
+        self.job_id = job_id
+        self.max_size = max_size
+        self.field_name = field_name
+
+        self.path: Optional[Path] = None
+        self.filename: Optional[str] = None
+        self.file_content_type: Optional[str] = None
+        self.size = 0
+
+        self._hash = hashlib.sha256()
+        self._header_name = b""
+        self._header_value = b""
+        self._part_headers = {}
+        self._in_video_part = False
+        self._video_done = False
+        self._pending: List[bytes] = []
+
+    # Parser callbacks (synchronous; data is buffered per chunk and written
+    # asynchronously in save())
+
+    def _on_part_begin(self):
+        self._part_headers = {}
+        self._in_video_part = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._part_headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._part_headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if name != self.field_name or filename is None or self.path is not None:
+            return
+
+        part_type = self._part_headers.get(b"content-type", b"").decode("latin-1")
+        if not part_type.startswith("video/"):
+            raise InvalidUploadError("File must be a video")
+
+        self.filename = Path(filename.decode("utf-8", "replace")).name or "video"
+        self.file_content_type = part_type
+        self.path = self.upload_dir / f"{self.job_id}_{self.filename}"
+        self._in_video_part = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_video_part:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_video_part:
+            self._video_done = True
+        self._in_video_part = False
+
+    async def save(self) -> dict:
+        """
+        Consume the request stream and write the video to disk
+
+        Returns:
+            Dict with path, filename, content_type, size and sha256
+
+        Raises:
+            UploadTooLargeError: If the file exceeds `max_size`
+            InvalidUploadError: If there is no video file part
+        """
+        _, params = parse_options_header(self.content_type)
+        if b"boundary" not in params:
+            raise InvalidUploadError("Expected a multipart/form-data upload")
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+        out = None
+        try:
+            async for chunk in self.stream:
+                parser.write(chunk)
+
+                if self._pending:
+                    if out is None:
+                        out = await aiofiles.open(self.path, "wb")
+                    for data in self._pending:
+                        self.size += len(data)
+                        if self.size > self.max_size:
+                            raise UploadTooLargeError(self.max_size)
+                        self._hash.update(data)
+                        await out.write(data)
+                    self._pending.clear()
+
+            parser.finalize()
+            if out is None and self.path is not None:
+                # Empty file part
+                out = await aiofiles.open(self.path, "wb")
+            if self.path is None or not self._video_done:
+                raise InvalidUploadError(f"No video file found in field '{self.field_name}'")
+        except BaseException:
+            if out is not None:
+                await out.close()
+                out = None
+            if self.path is not None:
+                self.path.unlink(missing_ok=True)
+            raise
+        finally:
+            if out is not None:
+                await out.close()
+
+        return {
+            "path": self.path,
+            "filename": self.filename,
+            "content_type": self.file_content_type,
+            "size": self.size,
+            "sha256": self._hash.hexdigest(),
+        }
@@ -1,107 +1,385 @@
 import os
-import subprocess
+import re
 from pathlib import Path
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import asyncio
-import whisper
+from concurrent.futures import Executor
+from app.whisper_registry import whisper_registry
+from app.transcription import TranscriptionEngine
+from app.transcript import Transcript
+
+
+# Presentation timestamp of each frame printed by ffmpeg's showinfo filter
+SHOWINFO_PTS_TIME = re.compile(r"\bn:\s*\d+\b.*?\bpts_time:(-?[\d.]+)")
+
+
+def frame_settings() -> Dict:
+    """Frame sampling settings from the environment
+    
+    Also used as part of the artifact cache key for selected frames.
+    """
+    return {
+        "frame_interval": int(os.getenv("FRAME_INTERVAL", 5)),
+        # planned: seek to precomputed timestamps at preview size (default)
+        # scene: one frame per detected content change, at preview size
+        # interval: decode the whole video with fps=1/FRAME_INTERVAL
+        "frame_sampling": os.getenv("FRAME_SAMPLING", "planned"),
+        "scene_threshold": float(os.getenv("SCENE_THRESHOLD", 0.3)),
+        "scene_min_gap": float(os.getenv("SCENE_MIN_GAP", 2)),
+        "max_vision_frames": int(os.getenv("MAX_VISION_FRAMES", 20)),
+        "preview_width": int(os.getenv("FRAME_PREVIEW_WIDTH", 768)),
+        "dedup": os.getenv("FRAME_DEDUP", "true").lower() == "true",
+        "dedup_threshold": int(os.getenv("FRAME_DEDUP_THRESHOLD", 6)),
+        "oversample": int(os.getenv("FRAME_OVERSAMPLE", 3)),
+    }
 
 
 class VideoProcessor:
     """Handles video processing: audio extraction, frame extraction, and transcription"""
     
     def __init__(self, video_path: Path):
+        settings = frame_settings()
         self.video_path = video_path
-        self.frame_interval = int(os.getenv("FRAME_INTERVAL", 5))
+        self.frame_interval = settings["frame_interval"]
+        self.extraction_mode = os.getenv("EXTRACTION_MODE", "concurrent")
+        self.frame_sampling = settings["frame_sampling"]
+        self.scene_threshold = settings["scene_threshold"]
+        self.scene_min_gap = settings["scene_min_gap"]
+        self.max_frames = settings["max_vision_frames"]
+        # Extra candidates so near-duplicate removal still leaves a full budget
+        if settings["dedup"]:
+            self.max_frames *= settings["oversample"]
+        self.preview_width = settings["preview_width"]
+        self.seek_concurrency = int(os.getenv("FRAME_SEEK_CONCURRENCY", 4))
         self.work_dir = video_path.parent
         
-    async def extract_audio(self) -> Path:
-        """Extract audio from video as WAV file"""
-        audio_path = self.work_dir / f"{self.video_path.stem}_audio.wav"
+    async def _run_ffmpeg(self, cmd: List[str], what: str) -> str:
+        """Run an ffmpeg command, raising with its stderr on failure"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
         
+        stdout, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"FFmpeg {what} failed: {stderr.decode()}")
+        
+        # ffmpeg logs (including showinfo output) go to stderr
+        return stderr.decode(errors="replace")
+    
+    @staticmethod
+    def _parse_frame_times(ffmpeg_log: str) -> List[float]:
+        """Presentation timestamps of the frames that reached showinfo"""
+        return [
+            round(float(match.group(1)), 2)
+            for match in SHOWINFO_PTS_TIME.finditer(ffmpeg_log)
+        ]
+    
+    async def probe_duration(self) -> Optional[float]:
+        """Container duration in seconds, or None if ffprobe can't tell"""
         cmd = [
-            "ffmpeg",
-            "-i", str(self.video_path),
+            "ffprobe",
+            "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            str(self.video_path)
+        ]
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, _ = await process.communicate()
+            return float(stdout.decode().strip())
+        except (OSError, ValueError):
+            return None
+    
+    def plan_frame_timestamps(self, duration: float, max_frames: Optional[int] = None) -> List[float]:
+        """
+        Pick the timestamps worth decoding
+        
+        Frames are FRAME_INTERVAL apart when that fits within the budget,
+        otherwise the budget is spread evenly over the whole video.
+        """
+        max_frames = max_frames or self.max_frames
+        step = max(float(self.frame_interval), duration / max_frames)
+        count = min(max_frames, max(1, int(duration // step)))
+        return [round(i * step, 2) for i in range(count)]
+    
+    def _audio_path(self) -> Path:
+        return self.work_dir / f"{self.video_path.stem}_audio.wav"
+    
+    def _frames_dir(self) -> Path:
+        frames_dir = self.work_dir / f"{self.video_path.stem}_frames"
+        frames_dir.mkdir(exist_ok=True)
+        return frames_dir
+    
+    @staticmethod
+    def _audio_output_args(audio_path: Path) -> List[str]:
+        return [
+            "-map", "0:a:0",
             "-vn",  # No video
             "-acodec", "pcm_s16le",  # PCM 16-bit
             "-ar", "16000",  # 16kHz sample rate
             "-ac", "1",  # Mono
-            "-y",  # Overwrite
             str(audio_path)
         ]
+    
+    def _frame_output_args(self, frames_dir: Path) -> List[str]:
+        return [
+            "-map", "0:v:0",
+            "-vf", f"fps=1/{self.frame_interval},showinfo",
+            "-q:v", "2",  # High quality
+            str(frames_dir / "frame_%04d.jpg")
+        ]
+    
+    def _collect_frames(
+        self,
+        frames_dir: Path,
+        ffmpeg_log: str = "",
+        prefix: str = "frame"
+    ) -> List[Tuple[float, Path]]:
+        """Collect frame paths with the timestamps reported by showinfo"""
+        frame_paths = sorted(frames_dir.glob(f"{prefix}_*.jpg"))
+        timestamps = self._parse_frame_times(ffmpeg_log)
+        if len(timestamps) != len(frame_paths):
+            # Fall back to inferring timestamps from the frame index
+            timestamps = [i * self.frame_interval for i in range(len(frame_paths))]
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate()
+        return list(zip(timestamps, frame_paths))
+    
+    async def extract_audio(self) -> Path:
+        """Extract audio from video as WAV file"""
+        audio_path = self._audio_path()
         
-        if process.returncode != 0:
-            raise Exception(f"FFmpeg audio extraction failed: {stderr.decode()}")
+        cmd = [
+            "ffmpeg",
+            "-y",  # Overwrite
+            "-i", str(self.video_path),
+            *self._audio_output_args(audio_path)
+        ]
+        await self._run_ffmpeg(cmd, "audio extraction")
         
         return audio_path
     
     async def extract_frames(self) -> List[Tuple[float, Path]]:
-        """Extract frames at regular intervals"""
-        frames_dir = self.work_dir / f"{self.video_path.stem}_frames"
-        frames_dir.mkdir(exist_ok=True)
+        """Extract candidate frames for the vision model"""
+        if self.frame_sampling == "scene":
+            return await self.extract_scene_frames()
+        
+        if self.frame_sampling == "planned":
+            duration = await self.probe_duration()
+            if duration:
+                return await self.extract_planned_frames(
+                    self.plan_frame_timestamps(duration)
+                )
+        
+        return await self.extract_interval_frames()
+    
+    async def extract_scene_frames(self) -> List[Tuple[float, Path]]:
+        """
+        Extract one preview frame per content change
+        
+        ffmpeg's scene score picks frames that differ from their predecessor
+        by more than SCENE_THRESHOLD (0-1), at least SCENE_MIN_GAP seconds
+        apart; the first frame is always kept. Timestamps are the real
+        presentation times printed by showinfo. On mostly static content
+        (slides, screencasts) this yields far fewer frames than fixed
+        interval sampling.
+        """
+        frames_dir = self._frames_dir()
         
-        # Extract frames at interval
+        select = (
+            f"select='isnan(prev_selected_t)"
+            f"+gt(scene,{self.scene_threshold})*gte(t-prev_selected_t,{self.scene_min_gap})'"
+        )
         cmd = [
             "ffmpeg",
+            "-y",
             "-i", str(self.video_path),
-            "-vf", f"fps=1/{self.frame_interval}",
-            "-q:v", "2",  # High quality
+            "-map", "0:v:0",
+            "-vf", f"{select},showinfo,scale='min({self.preview_width},iw)':-2",
+            "-fps_mode", "vfr",
+            "-q:v", "3",
+            str(frames_dir / "scene_%04d.jpg")
+        ]
+        ffmpeg_log = await self._run_ffmpeg(cmd, "scene frame extraction")
+        frames = self._collect_frames(frames_dir, ffmpeg_log, prefix="scene")
+        
+        # Keep an even spread if the video has more scene changes than the budget
+        if len(frames) > self.max_frames:
+            step = len(frames) / self.max_frames
+            frames = [frames[int(i * step)] for i in range(self.max_frames)]
+        
+        return frames
+    
+    async def _extract_frame_at(
+        self,
+        timestamp: float,
+        output_path: Path,
+        width: Optional[int] = None
+    ) -> Optional[Path]:
+        """Seek to a timestamp and decode a single frame"""
+        cmd = [
+            "ffmpeg",
             "-y",
-            str(frames_dir / "frame_%04d.jpg")
+            "-ss", str(timestamp),  # Input seeking: jump to nearest keyframe first
+            "-i", str(self.video_path),
+            "-map", "0:v:0",
+            "-frames:v", "1",
         ]
+        if width:
+            cmd += ["-vf", f"scale='min({width},iw)':-2", "-q:v", "3"]
+        else:
+            cmd += ["-q:v", "2"]
+        cmd.append(str(output_path))
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        await self._run_ffmpeg(cmd, f"frame extraction at {timestamp}s")
         
-        stdout, stderr = await process.communicate()
+        # Seeking past the last frame yields no output
+        return output_path if output_path.exists() else None
+    
+    async def extract_planned_frames(
+        self,
+        timestamps: List[float],
+        width: Optional[int] = None,
+        prefix: str = "frame"
+    ) -> List[Tuple[float, Path]]:
+        """
+        Decode only the given timestamps
         
-        if process.returncode != 0:
-            raise Exception(f"FFmpeg frame extraction failed: {stderr.decode()}")
+        Each frame is its own seek + single-frame decode, so cost scales with
+        the number of frames wanted rather than the length of the video.
+        Candidates default to FRAME_PREVIEW_WIDTH; full-resolution copies of
+        the chosen ones are pulled later by extract_full_frames.
+        """
+        frames_dir = self._frames_dir()
+        width = self.preview_width if width is None else width
+        semaphore = asyncio.Semaphore(self.seek_concurrency)
         
-        # Collect frame paths with timestamps
-        frames = []
-        for i, frame_path in enumerate(sorted(frames_dir.glob("frame_*.jpg"))):
-            timestamp = i * self.frame_interval
-            frames.append((timestamp, frame_path))
+        async def extract(i: int, timestamp: float) -> Optional[Path]:
+            async with semaphore:
+                return await self._extract_frame_at(
+                    timestamp,
+                    frames_dir / f"{prefix}_{i + 1:04d}.jpg",
+                    width
+                )
         
-        return frames
+        paths = await asyncio.gather(*[
+            extract(i, timestamp) for i, timestamp in enumerate(timestamps)
+        ])
+        
+        return [
+            (timestamp, path)
+            for timestamp, path in zip(timestamps, paths)
+            if path is not None
+        ]
     
-    async def transcribe_audio(self, audio_path: Path) -> str:
-        """Transcribe audio using Whisper"""
+    async def extract_full_frames(self, key_frames: List[Dict]) -> List[Dict]:
+        """Replace preview frames of the selected key frames with full-resolution ones"""
+        if self.frame_sampling == "interval" or not key_frames:
+            return key_frames
         
-        # Run in executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        transcript = await loop.run_in_executor(
-            None, 
-            self._transcribe_sync, 
-            audio_path
+        full_frames = await self.extract_planned_frames(
+            [frame["timestamp"] for frame in key_frames],
+            width=0,
+            prefix="full"
         )
+        full_paths = dict(full_frames)
+        
+        return [
+            {**frame, "path": full_paths.get(frame["timestamp"], frame["path"])}
+            for frame in key_frames
+        ]
+    
+    async def extract_interval_frames(self) -> List[Tuple[float, Path]]:
+        """Extract frames at regular intervals by decoding the whole video"""
+        frames_dir = self._frames_dir()
         
-        # Clean up audio file
-        audio_path.unlink(missing_ok=True)
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-i", str(self.video_path),
+            *self._frame_output_args(frames_dir)
+        ]
+        ffmpeg_log = await self._run_ffmpeg(cmd, "frame extraction")
         
-        return transcript
+        return self._collect_frames(frames_dir, ffmpeg_log)
     
-    def _transcribe_sync(self, audio_path: Path) -> str:
-        """Synchronous transcription using Whisper"""
-        # Use base model for balance of speed and accuracy
-        # Options: tiny, base, small, medium, large
-        model = whisper.load_model("base")
+    async def extract_audio_and_frames(self) -> Tuple[Path, List[Tuple[float, Path]]]:
+        """Extract the 16 kHz WAV and the candidate frames together
         
-        result = model.transcribe(
-            str(audio_path),
-            language="en"
+        EXTRACTION_MODE selects how:
+        - concurrent (default): audio and frame passes run side by side. The
+          audio pass only demuxes (-vn), so it finishes well within the
+          frame pass on any machine with a spare core.
+        - single_pass: one ffmpeg process with both outputs, so the
+          container is read only once. Useful when storage I/O, not decode,
+          is the bottleneck. Only applies to FRAME_SAMPLING=interval, since
+          planned sampling seeks instead of decoding the whole stream.
+        """
+        if self.extraction_mode == "single_pass" and self.frame_sampling == "interval":
+            audio_path = self._audio_path()
+            frames_dir = self._frames_dir()
+            
+            cmd = [
+                "ffmpeg",
+                "-y",
+                "-i", str(self.video_path),
+                *self._audio_output_args(audio_path),
+                *self._frame_output_args(frames_dir)
+            ]
+            ffmpeg_log = await self._run_ffmpeg(cmd, "audio/frame extraction")
+            
+            return audio_path, self._collect_frames(frames_dir, ffmpeg_log)
+        
+        audio_path, frames = await asyncio.gather(
+            self.extract_audio(),
+            self.extract_frames()
         )
+        return audio_path, frames
+    
+    async def stream_transcription(
+        self,
+        audio_path: Path,
+        executor: Optional[Executor] = None
+    ) -> AsyncIterator[Dict]:
+        """Transcribe audio using Whisper, yielding chunks as they finish
         
-        return result["text"].strip()
-
+        Long audio is split at silences and the chunks are transcribed in
+        parallel (see TranscriptionEngine; TRANSCRIBE_MODE=single restores
+        the one-call path). The audio file is removed once the stream ends.
+        
+        Args:
+            audio_path: 16 kHz mono WAV produced by extract_audio
+            executor: Pool to run Whisper in (defaults to the loop's thread pool)
+        
+        Yields:
+            Chunks in time order, as from TranscriptionEngine.stream()
+        """
+        
+        try:
+            async for chunk in TranscriptionEngine().stream(audio_path, executor):
+                whisper_registry.record(chunk["timings"])
+                yield chunk
+        finally:
+            # Clean up audio file
+            audio_path.unlink(missing_ok=True)
+    
+    async def transcribe_audio(self, audio_path: Path, executor: Optional[Executor] = None) -> Transcript:
+        """Transcribe audio using Whisper
+        
+        Args:
+            audio_path: 16 kHz mono WAV produced by extract_audio
+            executor: Pool to run Whisper in (defaults to the loop's thread pool)
+        
+        Returns:
+            The transcript with Whisper's segment timestamps
+        """
+        segments = []
+        async for chunk in self.stream_transcription(audio_path, executor):
+            segments.extend(chunk["segments"])
+        return Transcript.from_segments(segments)
@@ -0,0 +1,207 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import whisper
+from app.job_scheduler import transcribe_workers
+
+
+class WhisperModelRegistry:
+    """Process-wide cache of loaded Whisper models
+
+    Models are loaded lazily on first use and shared by every VideoProcessor
+    in the process. Entries are keyed by (model size, device, fp16) and the
+    least recently used model is dropped once more than `max_models` sizes
+    have been loaded.
+    """
+
+    def __init__(self, max_models: Optional[int] = None):
+        self._max_models = max_models
+        self._models: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per key: serialises loading and inference on a model, since
+        # Whisper installs kv-cache hooks on the shared modules during decoding
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+
+        self._stats_lock = threading.Lock()
+        # Models loaded in worker processes, as last reported by each worker
+        self._worker_models: Dict[int, List[Dict]] = {}
+        self._stats = {
+            "loads": 0,
+            "load_seconds": 0.0,
+            "transcriptions": 0,
+            "transcribe_seconds": 0.0,
+        }
+
+    # Settings are read on access because the shared instance is created at
+    # import time, before main.py has loaded .env
+    @property
+    def model_name(self) -> str:
+        return os.getenv("WHISPER_MODEL", "base")
+
+    @property
+    def device(self) -> Optional[str]:
+        return os.getenv("WHISPER_DEVICE") or None
+
+    @property
+    def fp16(self) -> bool:
+        return os.getenv("WHISPER_FP16", "false").lower() == "true"
+
+    @property
+    def max_models(self) -> int:
+        return self._max_models or int(os.getenv("WHISPER_MAX_MODELS", 2))
+
+    @property
+    def threads(self) -> int:
+        # With several transcription worker processes, each should use only
+        # its share of the cores instead of all of them
+        return int(os.getenv("WHISPER_THREADS") or 0) or max(1, (os.cpu_count() or 1) // transcribe_workers())
+
+    def _key(self, model_name: Optional[str], device: Optional[str]) -> Tuple:
+        return (model_name or self.model_name, device or self.device, self.fp16)
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _get_loaded(self, key: Tuple) -> Tuple[object, float]:
+        """Return (model, load_seconds); caller must hold the key lock"""
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model, 0.0
+
+        model_name, device, _ = key
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+
+        start = time.perf_counter()
+        model = whisper.load_model(model_name, device=device)
+        load_seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                evicted_key, _ = self._models.popitem(last=False)
+                print(f"Evicted Whisper model {evicted_key} from registry")
+
+        return model, load_seconds
+
+    def _loaded_models(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {"model": key[0], "device": key[1], "fp16": key[2]}
+                for key in self._models
+            ]
+
+    def _worker_report(self) -> Dict:
+        """Identifies this process and its loaded models in returned timings"""
+        return {"pid": os.getpid(), "loaded_models": self._loaded_models()}
+
+    def get_model(self, model_name: Optional[str] = None, device: Optional[str] = None):
+        """Return a shared model instance, loading it if needed"""
+        key = self._key(model_name, device)
+        with self._key_lock(key):
+            model, load_seconds = self._get_loaded(key)
+        if load_seconds:
+            self.record({"load_seconds": load_seconds})
+        return model
+
+    def warm_up(
+        self,
+        model_name: Optional[str] = None,
+        device: Optional[str] = None
+    ) -> Dict:
+        """
+        Load the configured model ahead of the first job
+
+        Like transcribe(), returns the timings instead of recording them so
+        it can run inside a worker process.
+        """
+        key = self._key(model_name, device)
+        with self._key_lock(key):
+            _, load_seconds = self._get_loaded(key)
+        return {"load_seconds": load_seconds, **self._worker_report()}
+
+    def transcribe(
+        self,
+        audio: Union[Path, np.ndarray],
+        model_name: Optional[str] = None,
+        device: Optional[str] = None,
+        **options
+    ) -> Tuple[dict, Dict]:
+        """
+        Transcribe audio with a shared model
+
+        `audio` is either a file path or float32 samples at 16 kHz. Returns
+        the raw Whisper result and the timings of this call. The timings are
+        not recorded here so that callers running this in a worker can
+        report them back to the registry of the parent process; they also
+        carry the worker's pid and loaded models for stats().
+        """
+        if not isinstance(audio, np.ndarray):
+            audio = str(audio)
+
+        key = self._key(model_name, device)
+        with self._key_lock(key):
+            model, load_seconds = self._get_loaded(key)
+            start = time.perf_counter()
+            result = model.transcribe(audio, fp16=key[2], **options)
+            transcribe_seconds = time.perf_counter() - start
+
+        return result, {
+            "load_seconds": load_seconds,
+            "transcribe_seconds": transcribe_seconds,
+            **self._worker_report(),
+        }
+
+    def record(self, timings: Dict):
+        """Accumulate load/transcribe timings into the registry metrics"""
+        with self._stats_lock:
+            if "loaded_models" in timings:
+                self._worker_models[timings["pid"]] = timings["loaded_models"]
+            if timings.get("load_seconds"):
+                self._stats["loads"] += 1
+                self._stats["load_seconds"] += timings["load_seconds"]
+            if "transcribe_seconds" in timings:
+                self._stats["transcriptions"] += 1
+                self._stats["transcribe_seconds"] += timings["transcribe_seconds"]
+
+    def stats(self) -> dict:
+        """
+        Snapshot of registry metrics
+
+        Models live in the transcription worker processes, so
+        `loaded_models` combines what each worker last reported with any
+        model loaded in this process, tagged with the owning pid.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+            models_by_pid = dict(self._worker_models)
+        own_models = self._loaded_models()
+        if own_models:
+            models_by_pid[os.getpid()] = own_models
+        stats["loaded_models"] = [
+            {**model, "pid": pid}
+            for pid, models in sorted(models_by_pid.items())
+            for model in models
+        ]
+        stats["max_models"] = self.max_models
+        return stats
+
+
+# Shared registry for this process
+whisper_registry = WhisperModelRegistry()
+
+
+def warm_up_worker() -> Dict:
+    """Process pool entry point that warms up the worker's own registry"""
+    return whisper_registry.warm_up()
@@ -1,61 +1,223 @@
 import os
+import re
+import time
+import asyncio
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse, parse_qs
 import yt_dlp
+from yt_dlp.utils import DownloadCancelled, DownloadError
+
+
+# Caption tracks to fetch, in order of preference (the pipeline is English)
+CAPTION_LANGUAGES = ("en", "en-US", "en-GB", "en-orig")
 
 
 class YouTubeDownloader:
     """Handles downloading videos from YouTube URLs"""
     
+    # Seconds between progress callbacks while downloading
+    PROGRESS_INTERVAL = 0.5
+    
     def __init__(self, output_dir: Path):
         self.output_dir = output_dir
         self.output_dir.mkdir(exist_ok=True)
+        # Frames are never used above this height, so don't fetch 4K streams
+        self.max_height = int(os.getenv("YOUTUBE_MAX_HEIGHT", 1080))
+        self.fragment_concurrency = int(os.getenv("YOUTUBE_FRAGMENT_CONCURRENCY", 4))
+        # Captions used instead of Whisper: auto (manual or automatic
+        # captions), manual (uploader-provided only) or off
+        self.captions = os.getenv("YOUTUBE_CAPTIONS", "auto")
+        if self.captions not in ("auto", "manual", "off"):
+            raise ValueError(f"Unknown YOUTUBE_CAPTIONS: {self.captions}")
+    
+    def _format(self) -> str:
+        """yt-dlp format selector capped at max_height, preferring mp4/m4a"""
+        h = self.max_height
+        return (
+            f"bestvideo[height<={h}][ext=mp4]+bestaudio[ext=m4a]"
+            f"/bestvideo[height<={h}]+bestaudio"
+            f"/best[height<={h}]"
+            # Sources without height information (or only larger streams)
+            f"/best"
+        )
     
-    def download(self, url: str, job_id: str) -> Path:
+    def _progress_hook(
+        self,
+        on_progress: Optional[Callable[[Dict], None]],
+        cancelled: Optional[threading.Event]
+    ) -> Callable[[Dict], None]:
         """
-        Download video from YouTube URL
+        yt-dlp progress hook reporting bytes across all requested streams
+        
+        Video and audio are downloaded one after the other, so bytes of
+        finished streams are carried over and the expected total comes from
+        the formats' (approximate) sizes when known.
+        """
+        finished: Dict[str, int] = {}
+        last_report = 0.0
+        
+        def hook(d: Dict):
+            nonlocal last_report
+            if cancelled is not None and cancelled.is_set():
+                raise DownloadCancelled()
+            if on_progress is None or d["status"] not in ("downloading", "finished"):
+                return
+            
+            if d["status"] == "finished":
+                finished[d.get("filename", "")] = d.get("downloaded_bytes") or d.get("total_bytes") or 0
+                current, current_total = 0, 0
+            else:
+                now = time.monotonic()
+                if now - last_report < self.PROGRESS_INTERVAL:
+                    return
+                last_report = now
+                current = d.get("downloaded_bytes") or 0
+                current_total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+            
+            info = d.get("info_dict") or {}
+            formats = info.get("requested_formats") or [info]
+            sizes = [f.get("filesize") or f.get("filesize_approx") for f in formats]
+            downloaded = sum(finished.values()) + current
+            if all(sizes):
+                total = max(sum(sizes), downloaded)
+            else:
+                total = (sum(finished.values()) + current_total) or None
+            
+            on_progress({
+                "downloaded_bytes": downloaded,
+                "total_bytes": total,
+                "speed": d.get("speed"),
+                "eta": d.get("eta"),
+            })
+        
+        return hook
+    
+    def _select_captions(self, info: Dict) -> Optional[Dict]:
+        """Pick the downloaded caption track, preferring manual captions"""
+        requested = info.get("requested_subtitles") or {}
+        manual = info.get("subtitles") or {}
+        tracks = []
+        for language in CAPTION_LANGUAGES:
+            track = requested.get(language)
+            if not track or not track.get("filepath") or not Path(track["filepath"]).exists():
+                continue
+            # yt-dlp falls back to automatic captions per language
+            automatic = language not in manual
+            if automatic and self.captions != "auto":
+                continue
+            tracks.append({"path": Path(track["filepath"]), "language": language, "automatic": automatic})
+        tracks.sort(key=lambda track: track["automatic"])
+        return tracks[0] if tracks else None
+    
+    def download(
+        self,
+        url: str,
+        job_id: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> Dict:
+        """
+        Download video from YouTube URL, with its English captions if the
+        YOUTUBE_CAPTIONS policy allows them
+        
+        Blocks for the whole download; use download_async from the event loop.
         
         Args:
             url: YouTube video URL
             job_id: Unique job identifier for filename
+            on_progress: Called (from the download thread, at most every
+                PROGRESS_INTERVAL seconds) with downloaded_bytes,
+                total_bytes (None if unknown), speed and eta
+            cancelled: Abort the download once this is set
             
         Returns:
-            Path to downloaded video file
+            Dict with "video_path" and "captions" (None, or a dict with the
+            WebVTT "path", its "language" and whether it is "automatic")
         """
         output_template = str(self.output_dir / f"{job_id}_%(title)s.%(ext)s")
         
         ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'format': self._format(),
             'outtmpl': output_template,
             'quiet': False,
             'no_warnings': False,
+            'noprogress': True,
             'extract_flat': False,
             'ignoreerrors': False,
             'merge_output_format': 'mp4',
+            'concurrent_fragment_downloads': self.fragment_concurrency,
+            'progress_hooks': [self._progress_hook(on_progress, cancelled)],
         }
+        if self.captions != "off":
+            ydl_opts.update({
+                'writesubtitles': True,
+                'writeautomaticsub': self.captions == "auto",
+                'subtitleslangs': list(CAPTION_LANGUAGES),
+                'subtitlesformat': 'vtt',
+            })
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Get video info first
-                info = ydl.extract_info(url, download=False)
-                video_title = info.get('title', 'video')
-                
-                # Download the video
-                ydl.download([url])
-                
-                # Find the downloaded file
-                # yt-dlp sanitizes the title, so we need to find the actual file
-                downloaded_files = list(self.output_dir.glob(f"{job_id}_*"))
-                
-                if not downloaded_files:
-                    raise FileNotFoundError("Downloaded video file not found")
-                
-                # Return the first matching file (should be only one)
-                return downloaded_files[0]
+            try:
+                # One round trip: resolve formats and download together
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            except DownloadError as e:
+                # A failed caption download aborts the whole download;
+                # captions are optional, so try again without them
+                if not ydl_opts.get('writesubtitles') or "subtitles" not in str(e):
+                    raise
+                print(f"Caption download failed, continuing without captions: {e}")
+                ydl_opts['writesubtitles'] = ydl_opts['writeautomaticsub'] = False
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            
+            captions = self._select_captions(info) if ydl_opts.get('writesubtitles') else None
+            caption_paths = {str(track.get("filepath")) for track in (info.get("requested_subtitles") or {}).values()}
+            for path in caption_paths:
+                if not captions or path != str(captions["path"]):
+                    Path(path).unlink(missing_ok=True)
+            
+            # Final (merged) file as reported by yt-dlp
+            for download in info.get("requested_downloads") or []:
+                filepath = download.get("filepath")
+                if filepath and Path(filepath).exists():
+                    return {"video_path": Path(filepath), "captions": captions}
+            
+            # yt-dlp sanitizes the title, so fall back to finding the file
+            downloaded_files = [
+                path for path in self.output_dir.glob(f"{job_id}_*")
+                if str(path) not in caption_paths
+            ]
+            if not downloaded_files:
+                raise FileNotFoundError("Downloaded video file not found")
+            return {"video_path": downloaded_files[0], "captions": captions}
                 
         except Exception as e:
             raise Exception(f"Failed to download YouTube video: {str(e)}")
     
+    async def download_async(
+        self,
+        url: str,
+        job_id: str,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Run download() in a worker thread so the event loop stays free
+        
+        If the awaiting task is cancelled, the download is aborted at its
+        next progress update.
+        """
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                None, self.download, url, job_id, on_progress, cancelled
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
     @staticmethod
     def is_youtube_url(url: str) -> bool:
         """Check if URL is a valid YouTube URL"""
@@ -67,6 +229,23 @@ class YouTubeDownloader:
         ]
         return any(domain in url.lower() for domain in youtube_domains)
     
+    @staticmethod
+    def video_id(url: str) -> Optional[str]:
+        """Extract the 11-character video ID from a YouTube URL"""
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        
+        if host.endswith("youtu.be"):
+            candidate = parsed.path.lstrip("/").split("/")[0]
+        elif parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [""])[0]
+        else:
+            # /shorts/<id>, /embed/<id>, /live/<id>, /v/<id>
+            match = re.match(r"^/(?:shorts|embed|live|v)/([^/?#]+)", parsed.path)
+            candidate = match.group(1) if match else ""
+        
+        return candidate if re.fullmatch(r"[A-Za-z0-9_-]{11}", candidate) else None
+    
     @staticmethod
     def validate_url(url: str) -> bool:
         """Validate YouTube URL format"""
@@ -0,0 +1,133 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Type
+import pytest
+from app import ai_service
+
+
+@pytest.fixture
+def serve() -> Iterator:
+    """Start a local HTTP server for a handler class; returns its base URL"""
+    servers = []
+
+    def start(handler: Type[BaseHTTPRequestHandler]) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+MESSAGE = {
+    "id": "msg_test",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-test",
+    "content": [{"type": "text", "text": "ok"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 2},
+}
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def _stream_events(text: str) -> bytes:
+    message = {**MESSAGE, "content": [], "stop_reason": None, "usage": {"input_tokens": 10, "output_tokens": 1}}
+    events = [
+        _sse("message_start", {"type": "message_start", "message": message}),
+        _sse("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+    ]
+    for word in text.split(" "):
+        events.append(_sse("content_block_delta", {
+            "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word + " "}
+        }))
+    events += [
+        _sse("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        _sse("message_delta", {
+            "type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": 3}
+        }),
+        _sse("message_stop", {"type": "message_stop"}),
+    ]
+    return b"".join(events)
+
+
+class MessagesStub:
+    """Scripted stand-in for POST /v1/messages
+
+    `statuses` is consumed one per request (200 once it runs out); every
+    request is delayed by `delay` seconds and the peak number of requests
+    in flight is tracked.
+    """
+
+    def __init__(self):
+        self.statuses = []
+        self.delay = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                try:
+                    time.sleep(stub.delay)
+                    if status != 200:
+                        payload = json.dumps({"type": "error", "error": {"type": "overloaded_error", "message": "busy"}}).encode()
+                        self.send_response(status)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Retry-After", "0")
+                    elif body.get("stream"):
+                        payload = _stream_events("Pozdravljen svet")
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/event-stream")
+                    else:
+                        payload = json.dumps(MESSAGE).encode()
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+        return Handler
+
+
+@pytest.fixture
+def messages_stub(serve, monkeypatch):
+    """Point AIService at a MessagesStub"""
+    stub = MessagesStub()
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", serve(stub.handler()))
+    monkeypatch.setenv("ANTHROPIC_MAX_RETRIES", "3")
+    monkeypatch.setenv("ANTHROPIC_MAX_CONCURRENCY", "2")
+    # The client and semaphore are per process; each test gets its own loop
+    monkeypatch.setattr(ai_service, "_shared_client", None)
+    monkeypatch.setattr(ai_service, "_request_semaphore", None)
+    return stub
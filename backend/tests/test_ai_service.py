@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from app import ai_service
+from app.ai_service import AIService
+
+
+def _create(service: AIService):
+    return service._create_message(
+        phase="test", model=AIService.model, max_tokens=10,
+        messages=[{"role": "user", "content": "hi"}]
+    )
+
+
+def test_create_message_retries_429_and_529(messages_stub):
+    messages_stub.statuses = [429, 529]
+    service = AIService()
+
+    response = asyncio.run(_create(service))
+
+    assert response.content[0].text == "ok"
+    assert messages_stub.requests == 3
+    assert service.retry_count == 2
+    assert service.usage["test"]["calls"] == 1
+    assert service.usage["test"]["retries"] == 2
+
+
+def test_create_message_gives_up_after_max_retries(messages_stub):
+    messages_stub.statuses = [529] * 10
+    service = AIService()
+
+    with pytest.raises(ai_service.anthropic.APIStatusError):
+        asyncio.run(_create(service))
+    assert messages_stub.requests == 4  # First attempt + ANTHROPIC_MAX_RETRIES
+    assert "test" not in service.usage
+
+
+def test_create_message_does_not_retry_client_errors(messages_stub):
+    messages_stub.statuses = [400]
+    service = AIService()
+
+    with pytest.raises(ai_service.anthropic.BadRequestError):
+        asyncio.run(_create(service))
+    assert messages_stub.requests == 1
+
+
+def test_retry_delay_backs_off_exponentially_without_retry_after():
+    error = ai_service.anthropic.APIConnectionError(request=None)
+    for attempt in range(4):
+        assert 2 ** attempt <= AIService._retry_delay(error, attempt) <= 2 ** attempt + 1
+
+
+def test_concurrency_cap(messages_stub):
+    messages_stub.delay = 0.2
+    service = AIService()
+
+    async def run():
+        return await asyncio.gather(*[_create(service) for _ in range(6)])
+
+    responses = asyncio.run(run())
+
+    assert len(responses) == 6
+    assert messages_stub.max_in_flight == 2
+
+
+def test_stream_text_retries_before_first_token(messages_stub):
+    messages_stub.statuses = [529]
+    service = AIService()
+
+    async def run():
+        return [
+            text async for text in service._stream_text(
+                phase="test", model=AIService.model, max_tokens=10,
+                messages=[{"role": "user", "content": "hi"}]
+            )
+        ]
+
+    chunks = asyncio.run(run())
+
+    assert "".join(chunks) == "Pozdravljen svet "
+    assert messages_stub.requests == 2
+    assert service.usage["test"]["retries"] == 1
+    assert service.usage["test"]["output_tokens"] == 3
+    assert "first_token_seconds" in service.usage["test"]
+
+
+def test_stream_text_shares_the_concurrency_cap(messages_stub):
+    messages_stub.delay = 0.2
+    service = AIService()
+
+    async def consume():
+        return "".join([
+            text async for text in service._stream_text(
+                phase="test", model=AIService.model, max_tokens=10,
+                messages=[{"role": "user", "content": "hi"}]
+            )
+        ])
+
+    async def run():
+        return await asyncio.gather(*[consume() for _ in range(3)], *[_create(service) for _ in range(3)])
+
+    asyncio.run(run())
+
+    assert messages_stub.max_in_flight == 2
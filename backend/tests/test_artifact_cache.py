@@ -0,0 +1,36 @@
+from pathlib import Path
+from app.artifact_cache import ArtifactCache
+
+
+def _cache(tmp_path: Path) -> ArtifactCache:
+    cache = ArtifactCache(cache_dir=tmp_path / "cache", max_bytes=700)
+    cache.prune_interval = 0
+    return cache
+
+
+def test_linked_files_survive_eviction(tmp_path):
+    cache = _cache(tmp_path)
+    frame = tmp_path / "frame.jpg"
+    frame.write_bytes(b"jpeg" * 128)
+    cache.put("frames", "old", {"key_frames": [{}]}, files={"frame_0": frame})
+
+    entry = cache.get("frames", "old", files_dir=tmp_path / "job_cached_frames")
+    # Another job's put() evicts the entry while this job still uses it
+    cache.put("frames", "new", {"key_frames": [{}]}, files={"frame_0": frame})
+
+    assert not cache.contains("frames", "old")
+    assert entry["files"]["frame_0"] == tmp_path / "job_cached_frames" / "frame_0.jpg"
+    assert entry["files"]["frame_0"].read_bytes() == b"jpeg" * 128
+
+
+def test_entry_with_missing_files_is_a_miss(tmp_path):
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    frame = tmp_path / "frame.jpg"
+    frame.write_bytes(b"jpeg")
+    entry = cache.put("frames", "key", {"key_frames": [{}]}, files={"frame_0": frame})
+    # Evicted between reading meta.json and linking the files
+    entry["files"]["frame_0"].unlink()
+
+    assert cache.get("frames", "key", files_dir=tmp_path / "job_cached_frames") is None
+    assert not (tmp_path / "job_cached_frames").exists()
+    assert cache.stats()["stages"]["frames"]["misses"] == 1
@@ -0,0 +1,150 @@
+import os
+from email.utils import formatdate
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.file_responses import file_response
+
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.fixture
+def served(tmp_path):
+    path = tmp_path / "newsletter.docx"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def get_file(request: Request):
+        return file_response(request, path, "application/octet-stream", "newsletter.docx")
+
+    client = TestClient(app)
+    etag = client.get("/file").headers["etag"]
+    return client, path, etag
+
+
+def test_full_response_carries_validators(served):
+    client, path, etag = served
+
+    response = client.get("/file")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert etag.startswith('"') and etag.endswith('"')
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["last-modified"] == formatdate(os.stat(path).st_mtime, usegmt=True)
+
+
+@pytest.mark.parametrize("header", ["{etag}", 'W/{etag}', '"other", {etag}', "*"])
+def test_if_none_match_answers_304(served, header):
+    client, _, etag = served
+
+    response = client.get("/file", headers={"If-None-Match": header.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(served):
+    client, path, _ = served
+    future = formatdate(os.stat(path).st_mtime + 3600, usegmt=True)
+
+    response = client.get("/file", headers={"If-None-Match": '"other"', "If-Modified-Since": future})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("offset, status", [(3600, 304), (0, 304), (-3600, 200)])
+def test_if_modified_since(served, offset, status):
+    client, path, _ = served
+    since = formatdate(os.stat(path).st_mtime + offset, usegmt=True)
+
+    assert client.get("/file", headers={"If-Modified-Since": since}).status_code == status
+
+
+def test_unparseable_if_modified_since_is_ignored(served):
+    client, _, _ = served
+
+    assert client.get("/file", headers={"If-Modified-Since": "yesterday"}).status_code == 200
+
+
+def test_not_modified_wins_over_range(served):
+    client, _, etag = served
+
+    response = client.get("/file", headers={"If-None-Match": etag, "Range": "bytes=0-9"})
+
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=-5000", 0, 1023),
+    ("Bytes = 5-5", 5, 5),
+])
+def test_satisfiable_range(served, header, start, end):
+    client, _, _ = served
+
+    response = client.get("/file", headers={"Range": header})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/1024"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000", "bytes=-0"])
+def test_unsatisfiable_range_answers_416(served, header):
+    client, _, _ = served
+
+    response = client.get("/file", headers={"Range": header})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=abc-", "bytes=9-5", "bytes=0-1,5-6", "items=0-9",
+    "bytes=--5", "bytes=+5-9", "bytes=-", "bytes=1_0-20",
+])
+def test_unusable_range_is_ignored(served, header):
+    client, _, _ = served
+
+    response = client.get("/file", headers={"Range": header})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_range_with_current_etag_serves_the_range(served):
+    client, _, etag = served
+
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+
+@pytest.mark.parametrize("if_range", ['"stale"', "W/{etag}", "Wed, 21 Oct 2015 07:28:00 GMT"])
+def test_if_range_mismatch_sends_the_whole_file(served, if_range):
+    client, _, etag = served
+
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": if_range.format(etag=etag)})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_changed_file_gets_a_new_etag(served):
+    client, path, etag = served
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    response = client.get("/file", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
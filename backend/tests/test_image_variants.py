@@ -0,0 +1,50 @@
+import re
+import pytest
+from PIL import Image, features
+from app.export_formatter import IMAGE_SIZES, _html_picture
+from app.image_variants import find_variants, image_settings, write_variants
+
+
+pytestmark = pytest.mark.skipif(not features.check("webp"), reason="Pillow has no WebP support")
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("IMAGE_MODERN_FORMATS", "webp")
+    source = tmp_path / "frame.jpg"
+    Image.new("RGB", (2400, 1350), "navy").save(source)
+    (tmp_path / "images").mkdir()
+    write_variants(source, tmp_path / "images", "frame_1", image_settings())
+    return tmp_path
+
+
+def test_every_format_is_written_at_web_and_print_width(output_dir):
+    variants = find_variants(output_dir, "images/frame_1.jpg")
+
+    assert set(variants) == {"web", "print", "webp", "print_webp"}
+    widths = {name: Image.open(output_dir / path).width for name, path in variants.items()}
+    assert widths == {"web": 1200, "print": 1600, "webp": 1200, "print_webp": 1600}
+
+
+def test_webp_source_gets_the_same_srcset_as_the_img(output_dir):
+    markup = _html_picture({"src": "images/frame_1.jpg", "alt": "Slide"}, output_dir)
+
+    source = re.search(r"<source [^>]*>", markup).group(0)
+    img = re.search(r"<img [^>]*>", markup).group(0)
+    assert 'type="image/webp"' in source
+    assert 'srcset="images/frame_1.webp 1200w, images/frame_1.print.webp 1600w"' in source
+    assert 'srcset="images/frame_1.jpg 1200w, images/frame_1.print.jpg 1600w"' in img
+    assert source.count(f'sizes="{IMAGE_SIZES}"') == img.count(f'sizes="{IMAGE_SIZES}"') == 1
+
+
+def test_small_frame_links_identical_variants(tmp_path, monkeypatch):
+    monkeypatch.setenv("IMAGE_MODERN_FORMATS", "webp")
+    source = tmp_path / "frame.jpg"
+    Image.new("RGB", (640, 360), "navy").save(source)
+
+    names = write_variants(source, tmp_path, "frame_1", image_settings())
+
+    assert (tmp_path / names["webp"]).samefile(tmp_path / names["print_webp"])
+    markup = _html_picture({"src": names["web"], "alt": ""}, tmp_path)
+    assert "sizes=" not in markup
+    assert f'<source type="image/webp" srcset="{names["webp"]}" />' in markup
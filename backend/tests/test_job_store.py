@@ -0,0 +1,52 @@
+import time
+import asyncio
+import sqlite3
+from app.job_store import SQLiteJobStore
+
+
+def test_sqlite_writes_wait_for_the_lock_off_the_event_loop(tmp_path):
+    store = SQLiteJobStore(tmp_path / "jobs.db")
+    store.create("job", status="processing", progress=0)
+
+    # Another worker process holds the write lock for a while
+    other = sqlite3.connect(tmp_path / "jobs.db", isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        asyncio.get_running_loop().call_later(0.5, other.execute, "COMMIT")
+        started = time.monotonic()
+        job = await store.update_async("job", progress=50)
+        ticker.cancel()
+        return job, ticks, time.monotonic() - started
+
+    job, ticks, waited = asyncio.run(run())
+
+    assert job["progress"] == 50
+    assert waited >= 0.4
+    assert ticks > 20
+    other.close()
+
+
+def test_queued_updates_apply_in_order(tmp_path):
+    store = SQLiteJobStore(tmp_path / "jobs.db")
+    store.create("job", status="processing", progress=0)
+
+    async def run():
+        for progress in range(1, 50):
+            store.update_nowait("job", progress=progress)
+        return await store.update_async("job", progress=100, status="completed")
+
+    job = asyncio.run(run())
+
+    assert job["progress"] == 100
+    assert job["version"] == 51
+    assert store.get("job")["status"] == "completed"
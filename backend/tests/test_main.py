@@ -0,0 +1,80 @@
+import time
+import asyncio
+import importlib
+from pathlib import Path
+import httpx
+import pytest
+from PIL import Image
+
+
+class FakeVideoProcessor:
+    """Stands in for ffmpeg and Whisper so a job goes straight to the LLM stages"""
+
+    def __init__(self, video_path: Path):
+        self.video_path = video_path
+
+    async def extract_audio_and_frames(self):
+        audio_path = self.video_path.with_suffix(".wav")
+        audio_path.write_bytes(b"")
+        frames = []
+        for i, color in enumerate(["red", "green", "blue"]):
+            frame_path = self.video_path.parent / f"{self.video_path.stem}_frame_{i}.jpg"
+            Image.new("RGB", (320, 180), color).save(frame_path)
+            frames.append((i * 10.0, frame_path))
+        return audio_path, frames
+
+    async def stream_transcription(self, audio_path: Path, executor=None):
+        yield {
+            "segments": [{"start": 0.0, "end": 30.0, "text": "Hello and welcome to the talk."}],
+            "end": 30.0,
+            "duration": 30.0,
+        }
+
+    async def extract_full_frames(self, key_frames):
+        return key_frames
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch, messages_stub):
+    # The app creates and serves its directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module("app.main")
+    monkeypatch.setattr(main, "VideoProcessor", FakeVideoProcessor)
+    return main
+
+
+def test_status_stays_responsive_while_llm_calls_are_in_flight(main, messages_stub):
+    messages_stub.delay = 2.0
+
+    async def run():
+        await main.scheduler.start()
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(
+                    "/api/upload", files={"file": ("talk.mp4", b"\0" * 1024, "video/mp4")}
+                )
+                assert response.status_code == 200
+                job_id = response.json()["job_id"]
+
+                deadline = time.monotonic() + 10
+                while messages_stub.in_flight == 0:
+                    assert time.monotonic() < deadline, "the job never called the LLM"
+                    await asyncio.sleep(0.01)
+
+                durations = []
+                for _ in range(5):
+                    started = time.monotonic()
+                    response = await client.get(f"/api/status/{job_id}")
+                    durations.append(time.monotonic() - started)
+                    assert response.status_code == 200
+                    assert response.json()["status"] == "processing"
+                    assert messages_stub.in_flight > 0
+                    await asyncio.sleep(0.05)
+                return durations
+        finally:
+            await main.scheduler.shutdown()
+
+    durations = asyncio.run(run())
+
+    assert max(durations) < 0.5
@@ -0,0 +1,89 @@
+from app.transcript import Transcript, parse_vtt
+
+
+# Layout of YouTube's automatic captions: every cue repeats the previous
+# line, words carry inline timing tags, 10 ms cues bridge the scroll, and
+# cues contain whitespace-only lines (which don't end the cue)
+AUTO_CAPTIONS = "\n".join([
+    "WEBVTT",
+    "Kind: captions",
+    "Language: en",
+    "",
+    "00:00:00.000 --> 00:00:02.000 align:start position:0%",
+    " ",
+    "welcome<00:00:00.500><c> to</c><00:00:01.000><c> the</c><00:00:01.500><c> talk</c>",
+    "",
+    "00:00:02.000 --> 00:00:02.010 align:start position:0%",
+    "welcome to the talk",
+    " ",
+    "",
+    "00:00:02.010 --> 00:00:04.000 align:start position:0%",
+    "welcome to the talk",
+    "today<00:00:02.500><c> we</c><00:00:03.000><c> cover</c><00:00:03.500><c> caching</c>",
+    "",
+    "00:00:04.000 --> 00:00:04.010 align:start position:0%",
+    "today we cover caching",
+    " ",
+    "",
+    "00:00:04.010 --> 00:00:06.000 align:start position:0%",
+    "today we cover caching",
+    "and<00:00:04.500><c> nothing</c><00:00:05.000><c> else</c>",
+    "",
+])
+
+
+def test_rolling_auto_captions_emit_each_line_once():
+    segments = parse_vtt(AUTO_CAPTIONS)
+
+    assert segments == [
+        {"start": 0.0, "end": 2.0, "text": "welcome to the talk"},
+        {"start": 2.01, "end": 4.0, "text": "today we cover caching"},
+        {"start": 4.01, "end": 6.0, "text": "and nothing else"},
+    ]
+
+
+def test_manual_captions_with_identifiers_notes_and_styles():
+    text = (
+        "WEBVTT\r\n\r\n"
+        "STYLE\r\n::cue { color: yellow }\r\n\r\n"
+        "NOTE written by hand\r\n\r\n"
+        "intro\r\n"
+        "01:02:03.250 --> 01:02:05.500\r\n"
+        "<v Speaker>Caching &amp; <i>invalidation</i></v>\r\n"
+        "are hard\r\n\r\n"
+        "2\r\n"
+        "62:06.000 --> 62:07.000\r\n"
+        "Q&amp;A &lt;later&gt;\r\n"
+    )
+
+    assert parse_vtt(text) == [
+        {"start": 3723.25, "end": 3725.5, "text": "Caching & invalidation are hard"},
+        {"start": 3726.0, "end": 3727.0, "text": "Q&A <later>"},
+    ]
+
+
+def test_empty_and_untimed_blocks_are_skipped():
+    text = "WEBVTT\n\n00:00:01.000 --> 00:00:02.000\n\n\nnot a cue\n\n00:00:02.000 --> 00:00:03.000\n<c> </c>\n"
+
+    assert parse_vtt(text) == []
+
+
+def test_line_said_again_after_other_speech_is_kept():
+    text = (
+        "WEBVTT\n\n"
+        "00:00:01.000 --> 00:00:02.000\nyes\n\n"
+        "00:00:02.000 --> 00:00:03.000\n \n\n"
+        "00:00:03.000 --> 00:00:04.000\nno\n\n"
+        "00:00:04.000 --> 00:00:05.000\nyes\n"
+    )
+
+    assert [segment["text"] for segment in parse_vtt(text)] == ["yes", "no", "yes"]
+
+
+def test_transcript_from_vtt_is_timed():
+    transcript = Transcript.from_vtt(AUTO_CAPTIONS)
+
+    assert transcript.timed
+    assert len(transcript) == 3
+    assert transcript.duration == 6.0
+    assert transcript.window(2.5, 3.5) == "today we cover caching"
@@ -0,0 +1,99 @@
+import os
+import time
+import asyncio
+import functools
+from http.server import SimpleHTTPRequestHandler
+import pytest
+from app.youtube_downloader import YouTubeDownloader
+
+
+VIDEO_SIZE = 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    """Serves files in small chunks with a pause, like a slow CDN"""
+
+    bytes_sent = 0
+
+    def log_message(self, *args):
+        pass
+
+    def copyfile(self, source, destination):
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            destination.write(chunk)
+            type(self).bytes_sent += len(chunk)
+            time.sleep(0.02)
+
+
+@pytest.fixture
+def video_url(serve, tmp_path):
+    www = tmp_path / "www"
+    www.mkdir()
+    (www / "talk.mp4").write_bytes(os.urandom(VIDEO_SIZE))
+    handler = type("Handler", (ThrottledHandler,), {"bytes_sent": 0})
+    base_url = serve(functools.partial(handler, directory=str(www)))
+    return f"{base_url}/talk.mp4", handler
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.setenv("YOUTUBE_CAPTIONS", "off")
+    monkeypatch.setattr(YouTubeDownloader, "PROGRESS_INTERVAL", 0.05)
+    return YouTubeDownloader(tmp_path / "downloads")
+
+
+def test_download_reports_byte_progress_off_the_event_loop(downloader, video_url):
+    url, _ = video_url
+    reports = []
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.02)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        result = await downloader.download_async(url, "job1", on_progress=reports.append)
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+
+    assert result["video_path"].stat().st_size == VIDEO_SIZE
+    assert result["captions"] is None
+    # The loop kept running while the download blocked its thread
+    assert ticks > 10
+    assert len(reports) >= 3
+    downloaded = [report["downloaded_bytes"] for report in reports]
+    assert downloaded == sorted(downloaded)
+    assert downloaded[-1] == VIDEO_SIZE
+    assert all(report["total_bytes"] in (None, VIDEO_SIZE) for report in reports)
+
+
+def test_cancelling_the_task_aborts_the_download(downloader, video_url):
+    url, handler = video_url
+
+    async def run():
+        task = asyncio.create_task(downloader.download_async(url, "job2"))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The worker thread stops at its next progress hook
+        await asyncio.sleep(0.5)
+        sent = handler.bytes_sent
+        await asyncio.sleep(0.5)
+        return sent
+
+    sent = asyncio.run(run())
+
+    assert 0 < sent < VIDEO_SIZE
+    assert handler.bytes_sent == sent
+    assert not any(path.suffix == ".mp4" for path in downloader.output_dir.iterdir())
@@ -1,7 +1,9 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import './ProgressTracker.css';
 
+const STREAM_EVENTS = ['snapshot', 'stage', 'progress'];
+
 function ProgressTracker({ jobId, onStatusUpdate, onComplete }) {
   const [status, setStatus] = useState({
     status: 'queued',
@@ -9,33 +11,91 @@ function ProgressTracker({ jobId, onStatusUpdate, onComplete }) {
     message: 'Starting...'
   });
 
+  // Keep the latest callbacks without reopening the stream on every render
+  const onStatusUpdateRef = useRef(onStatusUpdate);
+  const onCompleteRef = useRef(onComplete);
   useEffect(() => {
-    const pollStatus = async () => {
-      try {
-        const response = await axios.get(`/api/status/${jobId}`);
-        const newStatus = response.data;
-        setStatus(newStatus);
-        onStatusUpdate(newStatus);
+    onStatusUpdateRef.current = onStatusUpdate;
+    onCompleteRef.current = onComplete;
+  });
+
+  useEffect(() => {
+    let cancelled = false;
+    let finished = false;
+    let current = null;
+    let source = null;
+    let pollInterval = null;
+
+    const stop = () => {
+      if (source) source.close();
+      if (pollInterval) clearInterval(pollInterval);
+    };
+
+    const applyStatus = async (newStatus) => {
+      current = newStatus;
+      setStatus(newStatus);
+      onStatusUpdateRef.current(newStatus);
 
-        if (newStatus.status === 'completed') {
-          // Fetch the newsletter content
+      if (finished) return;
+      if (newStatus.status === 'completed') {
+        finished = true;
+        stop();
+        // Fetch the newsletter content
+        try {
           const previewResponse = await axios.get(`/api/preview/${jobId}`);
-          onComplete(previewResponse.data.content);
-        } else if (newStatus.status === 'failed') {
-          // Handle error
-          console.error('Processing failed:', newStatus.error);
+          if (!cancelled) onCompleteRef.current(previewResponse.data.content);
+        } catch (err) {
+          console.error('Failed to fetch newsletter:', err);
         }
+      } else if (newStatus.status === 'failed') {
+        // Handle error
+        finished = true;
+        stop();
+        console.error('Processing failed:', newStatus.error);
+      }
+    };
+
+    const pollStatus = async () => {
+      try {
+        const response = await axios.get(`/api/status/${jobId}`);
+        if (!cancelled) applyStatus(response.data);
       } catch (err) {
         console.error('Failed to fetch status:', err);
       }
     };
 
-    // Poll every 2 seconds
-    const interval = setInterval(pollStatus, 2000);
-    pollStatus(); // Initial call
+    // Fallback when server-sent events aren't available: poll every 2 seconds
+    const startPolling = () => {
+      if (pollInterval || finished) return;
+      pollInterval = setInterval(pollStatus, 2000);
+      pollStatus();
+    };
 
-    return () => clearInterval(interval);
-  }, [jobId, onStatusUpdate, onComplete]);
+    if (typeof EventSource === 'undefined') {
+      startPolling();
+    } else {
+      // The server pushes a snapshot, then only the fields that change
+      source = new EventSource(`/api/events/${jobId}`);
+      const handleEvent = (event) => {
+        applyStatus({ ...current, ...JSON.parse(event.data) });
+      };
+      STREAM_EVENTS.forEach((name) => source.addEventListener(name, handleEvent));
+      source.addEventListener('end', () => source.close());
+      source.addEventListener('deleted', () => source.close());
+      source.onerror = () => {
+        // EventSource reconnects (resuming from the last event) on its own;
+        // only fall back to polling once it has given up
+        if (source.readyState === EventSource.CLOSED) {
+          startPolling();
+        }
+      };
+    }
+
+    return () => {
+      cancelled = true;
+      stop();
+    };
+  }, [jobId]);
 
   const getStageInfo = () => {
     if (status.progress < 20) return { stage: 'Uploading', icon: '📤' };